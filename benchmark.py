@@ -0,0 +1,422 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import edi
+import logXchecker
+import rules as _rules
+
+SYNTHETIC_BANDS = ('144', '432', '1296', '2320', '3400', '5760', '10368', '24048')
+SYNTHETIC_BEGIN = datetime(2013, 8, 3, 12, 0)
+SYNTHETIC_PERIOD_HOURS = 6
+SYNTHETIC_ERRORS = ('callsign', 'serial', 'locator', 'time', 'format')
+PHASES = ('rules', 'parse', 'header', 'qsos', 'mark', 'crosscheck', 'score', 'output')
+
+TEST_LOGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_logs')
+# command line arguments of every logXchecker mode measured by startup_benchmark()
+STARTUP_MODES = {
+    'slc': ['-r', os.path.join(TEST_LOGS, 'rules.config'), '-slc',
+            os.path.join(TEST_LOGS, 'logs', 'yo2lza_20160514_091251.edi'), '-o', 'json'],
+    'mlc': ['-r', os.path.join(TEST_LOGS, 'rules.config'), '-mlc', os.path.join(TEST_LOGS, 'logs'), '-o', 'json'],
+    'cc': ['-r', os.path.join(TEST_LOGS, 'rules.config'), '-cc', os.path.join(TEST_LOGS, 'logs'),
+           '-cl', os.path.join(TEST_LOGS, 'checklogs'), '-o', 'json'],
+}
+
+
+def synthetic_qso_lines(qsos_nr, stations_nr=200):
+    """
+    :return: list with valid edi qso lines, worked callsigns & locators are repeated like in a real log
+    """
+    lines = []
+    for nr in range(qsos_nr):
+        station = nr % stations_nr
+        callsign = 'YO{}A{}'.format(station % 10, chr(ord('A') + station // 10 % 26) * 2)
+        locator = 'KN{:02d}{}{}'.format(station % 100, chr(ord('A') + station % 24), chr(ord('A') + station // 24 % 24))
+        minute = nr % 1440
+        lines.append('130803;{:02d}{:02d};{};6;59;{:03d};59;{:03d};;{};1;;;;'.format(
+            minute // 60, minute % 60, callsign, nr % 1000, (nr * 7) % 1000, locator))
+    return lines
+
+
+def qso_memory(qsos_nr=10000):
+    """
+    Measure the memory used by parsed qsos (edi.LogQso)
+    :return: bytes per qso
+    """
+    lines = synthetic_qso_lines(qsos_nr)
+    gc.collect()
+    tracemalloc.start()
+    qsos = [edi.LogQso(line, nr + 1) for nr, line in enumerate(lines)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del qsos
+    return size / qsos_nr
+
+
+def synthetic_callsign(nr):
+    """
+    :return: unique callsign for operator number nr (YO0AAA, YO1AAA, ..., YO9ZZZ)
+    """
+    suffix = ''
+    rest = nr // 10
+    for _ in range(3):
+        suffix = chr(ord('A') + rest % 26) + suffix
+        rest //= 26
+    return 'YO{}{}'.format(nr % 10, suffix)
+
+
+def synthetic_locator(rnd):
+    return '{}N{:02d}{}{}'.format(rnd.choice('JK'), rnd.randrange(100),
+                                  chr(ord('A') + rnd.randrange(24)), chr(ord('A') + rnd.randrange(24)))
+
+
+def synthetic_rules(bands_nr=2, periods_nr=1):
+    """
+    :return: content of a rules file for a synthetic contest with back to back periods of 6 hours
+    """
+    end = SYNTHETIC_BEGIN + timedelta(hours=SYNTHETIC_PERIOD_HOURS * periods_nr, minutes=-1)
+    bands = ','.join('band{}'.format(band + 1) for band in range(bands_nr))
+    content = ['[contest]',
+               'name=Synthetic contest',
+               'begindate={:%Y%m%d}'.format(SYNTHETIC_BEGIN),
+               'enddate={:%Y%m%d}'.format(end),
+               'beginhour={:%H%M}'.format(SYNTHETIC_BEGIN),
+               'endhour={:%H%M}'.format(end),
+               'bands={}'.format(bands_nr),
+               'periods={}'.format(periods_nr),
+               'categories=2',
+               'modes=1,2',
+               '',
+               '[log]',
+               'format=edi',
+               '']
+    for band in range(bands_nr):
+        content.extend(['[band{}]'.format(band + 1),
+                        'band={}'.format(SYNTHETIC_BANDS[band]),
+                        'regexp={}'.format(SYNTHETIC_BANDS[band]),
+                        'multiplier=1',
+                        ''])
+    for period in range(periods_nr):
+        begin = SYNTHETIC_BEGIN + timedelta(hours=SYNTHETIC_PERIOD_HOURS * period)
+        end = begin + timedelta(hours=SYNTHETIC_PERIOD_HOURS, minutes=-1)
+        content.extend(['[period{}]'.format(period + 1),
+                        'begindate={:%Y%m%d}'.format(begin),
+                        'enddate={:%Y%m%d}'.format(end),
+                        'beginhour={:%H%M}'.format(begin),
+                        'endhour={:%H%M}'.format(end),
+                        'bands={}'.format(bands),
+                        ''])
+    content.extend(['[category1]',
+                    'name=Single Operator',
+                    'regexp=sosb|somb',
+                    'bands={}'.format(bands),
+                    '',
+                    '[category2]',
+                    'name=Checklogs',
+                    'regexp=check',
+                    'bands={}'.format(bands),
+                    ''])
+    return '\n'.join(content)
+
+
+def synthetic_contest(folder, operators_nr=100, qsos_nr=100, bands_nr=2, periods_nr=1, error_rate=0.01,
+                      checklogs_share=0.05, seed=0):
+    """
+    Write a synthetic contest : rules.config, logs & checklogs folders with an edi log for every operator & band.
+    The qsos are made in pairs and logged by both operators with same time, mode and exchanged serials,
+    a contact is made only once per period. A share of error_rate qsos have an error in one of the logs
+    (busted callsign, serial or locator, wrong time or an invalid qso line).
+    :param qsos_nr: qsos per log (rounded to an even number per period, at most operators_nr - 1 per period)
+    :param checklogs_share: share of operators who send checklogs
+    :return: tuple(rules path, logs folder, checklogs folder)
+    """
+    rnd = random.Random(seed)
+    rules_path = os.path.join(folder, 'rules.config')
+    logs_folder = os.path.join(folder, 'logs')
+    checklogs_folder = os.path.join(folder, 'checklogs')
+    os.makedirs(logs_folder, exist_ok=True)
+    os.makedirs(checklogs_folder, exist_ok=True)
+    with open(rules_path, 'w') as _file:
+        _file.write(synthetic_rules(bands_nr, periods_nr))
+
+    callsigns = [synthetic_callsign(nr) for nr in range(operators_nr)]
+    locators = [synthetic_locator(rnd) for _ in range(operators_nr)]
+    checklogs = set(rnd.sample(range(operators_nr), int(round(operators_nr * checklogs_share))))
+    period_minutes = SYNTHETIC_PERIOD_HOURS * 60
+    offsets_nr = min(qsos_nr // periods_nr // 2, (operators_nr - 1) // 2)
+    end = SYNTHETIC_BEGIN + timedelta(hours=SYNTHETIC_PERIOD_HOURS * periods_nr, minutes=-1)
+
+    for band in range(bands_nr):
+        # every operator works the operators found at same offsets in a shuffled order
+        pairs = []  # [minute, operator1, operator2]
+        for period in range(periods_nr):
+            order = list(range(operators_nr))
+            rnd.shuffle(order)
+            for offset in rnd.sample(range(1, (operators_nr + 1) // 2), offsets_nr):
+                for nr in range(operators_nr):
+                    minute = period * period_minutes + rnd.randrange(period_minutes)
+                    pairs.append((minute, order[nr], order[(nr + offset) % operators_nr]))
+        pairs.sort()
+
+        # the serials are given in time order
+        serials = {}  # {(pair index, operator): serial}
+        qsos = [[] for _ in range(operators_nr)]
+        for index, (_, op1, op2) in enumerate(pairs):
+            for op in (op1, op2):
+                qsos[op].append(index)
+                serials[(index, op)] = len(qsos[op])
+
+        for op in range(operators_nr):
+            lines = []
+            for index in qsos[op]:
+                minute, op1, op2 = pairs[index]
+                other = op2 if op == op1 else op1
+                mode = 1 + minute % 2
+                rst = '59' if mode == 1 else '599'
+                qso = {'time': SYNTHETIC_BEGIN + timedelta(minutes=minute),
+                       'call': callsigns[other],
+                       'serial': serials[(index, other)],
+                       'locator': locators[other],
+                       'hour': None}
+                if op == op1 and rnd.random() < error_rate:
+                    error = rnd.choice(SYNTHETIC_ERRORS)
+                    if error == 'callsign':
+                        qso['call'] = qso['call'][:-1] + chr(ord('A') + (ord(qso['call'][-1]) - ord('A') + 1) % 26)
+                    elif error == 'serial':
+                        qso['serial'] += 1
+                    elif error == 'locator':
+                        qso['locator'] = qso['locator'][:-1] + ('A' if qso['locator'][-1] != 'A' else 'B')
+                    elif error == 'time':
+                        qso['time'] += timedelta(minutes=15)
+                    else:
+                        qso['hour'] = '2599'
+                lines.append('{:%y%m%d};{};{};{};{};{:03d};{};{:03d};;{};1;;;;'.format(
+                    qso['time'], qso['hour'] or '{:%H%M}'.format(qso['time']), qso['call'], mode,
+                    rst, serials[(index, op)], rst, qso['serial'], qso['locator']))
+
+            checklog = op in checklogs
+            header = ['[REG1TEST;1]',
+                      'TName=Synthetic contest',
+                      'TDate={:%Y%m%d};{:%Y%m%d}'.format(SYNTHETIC_BEGIN, end),
+                      'PCall={}'.format(callsigns[op]),
+                      'PWWLo={}'.format(locators[op]),
+                      'PSect={}'.format('Check' if checklog else 'SOSB'),
+                      'PBand={} MHz'.format(SYNTHETIC_BANDS[band]),
+                      '[QSORecords;{}]'.format(len(lines))]
+            path = os.path.join(checklogs_folder if checklog else logs_folder,
+                                '{}_{}.edi'.format(callsigns[op], SYNTHETIC_BANDS[band]))
+            with open(path, 'w') as _file:
+                _file.write('\n'.join(header + lines + ['[END;Synthetic contest]', '']))
+    return rules_path, logs_folder, checklogs_folder
+
+
+def contest_benchmark(rules_path, logs_folder, checklogs_folder=None):
+    """
+    Cross-check a contest with the same steps as edi.crosscheck_logs_filter() and measure every phase.
+    The logs are read first with header_only=True, the 'qsos' phase reads the logs again.
+    :return: dictionary with the number of logs, qsos & confirmed qsos and the seconds of every phase
+    """
+    seconds = {}
+    start = time.perf_counter()
+    rules = _rules.Rules(rules_path)
+    seconds['rules'] = time.perf_counter() - start
+
+    logs_paths = edi.crosscheck_logs_paths(rules, logs_folder, checklogs_folder)
+    start = time.perf_counter()
+    for path, _ in logs_paths:
+        edi.Log.read_file_content(path)
+    seconds['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    logs = [edi.Log(path, rules=rules, checklog=checklog, header_only=True) for path, checklog in logs_paths]
+    seconds['header'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for log in logs:
+        if log.valid_header:
+            log.load_qsos()
+    seconds['qsos'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    operator_instances = edi.operators_from_logs(logs)
+    bands = edi.contest_rules(rules).bands
+    for band in bands:
+        for _ham in operator_instances.values():
+            edi.mark_older_logs(_ham.logs_by_band(band.nr))
+    seconds['mark'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for band in bands:
+        edi.crosscheck_logs(operator_instances, rules, band.nr)
+    seconds['crosscheck'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    edi.score_logs(operator_instances.values())
+    seconds['score'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as _file:
+        for chunk in edi.json_dict_stream({edi.INFO_CC: logs_folder}, edi.INFO_OPERATORS,
+                                          logXchecker.operators_output(operator_instances, verbose=True)):
+            _file.write(chunk)
+    seconds['output'] = time.perf_counter() - start
+
+    return {'logs': len(logs),
+            'qsos': sum(len(log.qsos) for log in logs),
+            'confirmed_qsos': sum(log.qsos_confirmed or 0 for log in logs),
+            'seconds': seconds,
+            'total_seconds': sum(seconds.values())}
+
+
+def scaling_benchmark(scales, bands_nr=2, periods_nr=1, error_rate=0.01, checklogs_share=0.05, seed=0):
+    """
+    Generate a synthetic contest for every scale and cross-check it
+    :param scales: list with tuple(operators number, qsos per log)
+    :return: list with contest_benchmark() results
+    """
+    results = []
+    for operators_nr, qsos_nr in scales:
+        with tempfile.TemporaryDirectory(prefix='logxchecker-benchmark-') as folder:
+            start = time.perf_counter()
+            paths = synthetic_contest(folder, operators_nr=operators_nr, qsos_nr=qsos_nr, bands_nr=bands_nr,
+                                      periods_nr=periods_nr, error_rate=error_rate,
+                                      checklogs_share=checklogs_share, seed=seed)
+            generate_seconds = time.perf_counter() - start
+            edi.distance_cache_clear()
+            result = {'operators': operators_nr, 'qsos_per_log': qsos_nr, 'generate_seconds': generate_seconds}
+            result.update(contest_benchmark(*paths))
+        results.append(result)
+    return results
+
+
+def parse_import_times(text):
+    """
+    Parse the 'python -X importtime' report
+    :return: dictionary {module: cumulative microseconds} with the top level imports
+    """
+    imports = {}
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented, the cumulative time of a top level import includes them
+        if not cumulative.strip().isdigit() or name[1:2] == ' ':
+            continue
+        imports[name.strip()] = imports.get(name.strip(), 0) + int(cumulative)
+    return imports
+
+
+def startup_benchmark(modes=None, repeat=3):
+    """
+    Run logXchecker with 'python -X importtime' for every mode, the best of repeat runs is kept
+    :param modes: dictionary {mode: command line arguments} (default: STARTUP_MODES)
+    :return: dictionary {mode: {'import_us': total import time, 'wall_seconds': run time, 'imports': {...}}}
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logXchecker.py')
+    results = {}
+    for mode, args in (modes or STARTUP_MODES).items():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            process = subprocess.run([sys.executable, '-X', 'importtime', script] + args,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+            wall_seconds = time.perf_counter() - start
+            imports = parse_import_times(process.stderr)
+            result = {'import_us': sum(imports.values()), 'wall_seconds': wall_seconds,
+                      'imports': dict(sorted(imports.items(), key=lambda item: -item[1]))}
+            if mode not in results or result['import_us'] < results[mode]['import_us']:
+                results[mode] = result
+    return results
+
+
+def check_scales_value(arg):
+    """
+    :param arg: comma separated scales, a scale is operators x qsos per log (ex: 100x100,2000x1000)
+    :return: list with tuple(operators number, qsos per log)
+    :raise: ArgumentTypeError
+    """
+    try:
+        scales = [tuple(int(value) for value in scale.lower().split('x')) for scale in arg.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('Scales "{}" is an invalid value'.format(arg))
+    if not all(len(scale) == 2 and scale[0] > 2 and scale[1] > 1 for scale in scales):
+        raise argparse.ArgumentTypeError('Scales "{}" is an invalid value'.format(arg))
+    return scales
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='logXchecker benchmarks')
+    parser.add_argument('-q', '--qsos', type=int, default=10000, help='Number of synthetic qsos (default: 10000)')
+    parser.add_argument('-s', '--scales', type=check_scales_value, default=None, metavar='OPERATORSxQSOS,...',
+                        help='Cross-check synthetic contests at these scales (ex: 100x100,2000x1000)')
+    parser.add_argument('--bands', type=int, default=2, choices=range(1, len(SYNTHETIC_BANDS) + 1),
+                        help='Number of contest bands (default: 2)')
+    parser.add_argument('--periods', type=int, default=1, help='Number of contest periods (default: 1)')
+    parser.add_argument('--error-rate', type=float, default=0.01, help='Share of qsos with errors (default: 0.01)')
+    parser.add_argument('--checklogs-share', type=float, default=0.05,
+                        help='Share of operators who send checklogs (default: 0.05)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of synthetic contests (default: 0)')
+    parser.add_argument('--generate', type=str, default=None, metavar='path_to_folder',
+                        help='Only write the synthetic contest of the 1st scale to folder')
+    parser.add_argument('--startup', action='store_true',
+                        help='Measure the import time (python -X importtime) of every logXchecker mode')
+    parser.add_argument('--report', type=str, default=None, metavar='path_to_file',
+                        help='Write the benchmark results as JSON to file')
+    args = parser.parse_args(args)
+
+    contest_args = dict(bands_nr=args.bands, periods_nr=args.periods, error_rate=args.error_rate,
+                        checklogs_share=args.checklogs_share, seed=args.seed)
+    if args.generate:
+        operators_nr, qsos_nr = (args.scales or [(100, 100)])[0]
+        paths = synthetic_contest(args.generate, operators_nr=operators_nr, qsos_nr=qsos_nr, **contest_args)
+        print('Rules : {}\nLogs : {}\nChecklogs : {}'.format(*paths))
+        return
+
+    report = {'memory_per_qso': qso_memory(args.qsos)}
+    print('Memory per qso : {:.0f} bytes ({} qsos)'.format(report['memory_per_qso'], args.qsos))
+
+    if args.scales:
+        report['contest'] = contest_args
+        report['scales'] = scaling_benchmark(args.scales, **contest_args)
+        for result in report['scales']:
+            print('{} operators x {} qsos : {} logs, {} qsos, {} confirmed, {:.2f}s ({})'.format(
+                result['operators'], result['qsos_per_log'], result['logs'], result['qsos'],
+                result['confirmed_qsos'], result['total_seconds'],
+                ', '.join('{}={:.3f}s'.format(phase, result['seconds'][phase]) for phase in PHASES)))
+
+    if args.startup:
+        report['startup'] = startup_benchmark()
+        for mode, result in report['startup'].items():
+            print('Startup {} : imports {:.1f}ms, run {:.3f}s ({})'.format(
+                mode, result['import_us'] / 1000, result['wall_seconds'],
+                ', '.join('{}={:.1f}ms'.format(name, us / 1000) for name, us in list(result['imports'].items())[:5])))
+
+    if args.report:
+        with open(args.report, 'w') as _file:
+            json.dump(report, _file, indent=2)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
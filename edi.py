@@ -14,15 +14,24 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 import math
+import numbers
 import os
 import re
+import sys
 import datetime
-from collections import namedtuple
+from collections import deque, namedtuple
+from collections.abc import Iterable, Mapping
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from operator import attrgetter
 
-from dicttoxml import dicttoxml
-from validate_email import validate_email
+import logarchive
+from rules import DEFAULT_QSO_TIME_TOLERANCE
+
+# optional NumPy module, imported on first use by import_numpy() (None if NumPy is not installed)
+numpy = False
 
 INFO_MLC = 'multi_logs_folder'
 INFO_CC = 'cross_check_folder'
@@ -35,6 +44,16 @@ ERR_HEADER = 'header'
 ERR_QSO = 'qso'
 
 
+def regex_match(pattern, string, flags=0):
+    """
+    Same as re.match(), the checks out of the qso hot path call it so profiler.Profiler can count them
+    :param pattern: regular expression (str) or compiled pattern
+    """
+    if isinstance(pattern, str):
+        return re.match(pattern, string, flags)
+    return pattern.match(string)
+
+
 class Operator(object):
     """
     Keep operator callsign, info and logs path
@@ -42,23 +61,41 @@ class Operator(object):
     callsign = None
     info = {}           # FIXME : no idea what was this for :(
     logs = []           # list with Log() instances
+    logs_band = {}      # {contest band number: [Log() instances with valid header]}
 
     def __init__(self, callsign):
         self.callsign = callsign
         self.logs = []
+        self.logs_band = {}
 
     def add_log_by_path(self, path, rules=None, checklog=False):
-        self.logs.append(Log(path, rules=rules, checklog=checklog))
+        self.add_log_instance(Log(path, rules=rules, checklog=checklog))
 
     def add_log_instance(self, log):
         self.logs.append(log)
+        if log.valid_header:
+            for band_nr in log.band_nrs or ():
+                self.logs_band.setdefault(band_nr, []).append(log)
+
+    def logs_by_band(self, band_nr):
+        """
+        :param band_nr: contest band number
+        :return: list with the logs (with valid header) for this band
+        """
+        return self.logs_band.get(band_nr, [])
 
     def logs_by_band_regexp(self, band_regexp):
+        """
+        Kept only as compatibility API, the checker doesn't use it: the regexp is matched again for every log
+        on every call, use logs_by_band() with the contest band number instead
+        :param band_regexp: regular expression matched (case insensitive) with the log band
+        :return: list with the logs (with valid header) whose band matches band_regexp
+        """
         logs = []
         for log in self.logs:
             if not log.valid_header:
                 continue
-            res = re.match(band_regexp, log.band, re.IGNORECASE)
+            res = regex_match(band_regexp, log.band, re.IGNORECASE)
             if res:
                 logs.append(log)
         return logs
@@ -79,16 +116,19 @@ class Log(object):
     """
     use_as_checklog = False
     ignore_this_log = None  # if flag is set this log will not be used in cross-check
+    header_only = False  # if flag is set only the log header was read, see load_qsos()
 
     path = None
     rules = None
     log_lines = None
+    header_fields = None  # {FIELD: ([values], last line number)} from log header
     valid_header = None
     valid_qsos = None
     errors = None
     callsign = None
     maidenhead_locator = None
     band = None
+    band_nrs = None  # numbers of the contest bands matching the log band (set if rules are provided)
     category = None  # section
     category_raw = None
     date = None
@@ -98,22 +138,49 @@ class Log(object):
 
     qsos_tuple = namedtuple('qso_tuple', ['linenr', 'qso', 'valid', 'errors']) # REMOVE
     qsos = list()   # list with LogQso instances
+    qsos_index = None  # valid qsos indexed by (worked callsign, period number), sorted by qso time
+    qsos_index_minutes = None  # qsos time (epoch minute) for every qsos_index list
     qsos_points = None
     qsos_confirmed = None
 
-    def __init__(self, path, rules=None, checklog=False):
+    def __init__(self, path, rules=None, checklog=False, header_only=False, lines=None):
+        """
+        :param header_only: if True only the log header is read & validated, see load_qsos()
+        :param lines: log content as list of lines, if set the log is not read from path
+                      (path is used only as log name)
+        """
         self.path = path
         self.rules = rules
         self.use_as_checklog = checklog
         self.ignore_this_log = False
+        # the provided lines are the full log, load_qsos() doesn't have to read it again
+        self.header_only = header_only and lines is None
+        self.log_lines = lines
         self.errors = {ERR_IO: [],
                        ERR_HEADER: [],
                        ERR_QSO: []}
 
         self.validate_header()
-        if not self.valid_header:
+        if not self.valid_header or header_only:
             return
 
+        self.load_qsos()
+
+    def load_qsos(self):
+        """
+        Parse & validate the qsos.
+        This is done at init, except for logs created with header_only=True. The qsos are loaded only once.
+        """
+        if self.valid_qsos is not None:
+            return
+        if self.header_only:
+            self.header_only = False
+            try:
+                self.log_lines = self.read_file_content(self.path)
+            except Exception as e:
+                self.errors[ERR_IO].append((None, 'Cannot read edi log. Error: {}'.format(e)))
+                return
+
         self.get_qsos()
         self.valid_qsos = True
         for qso in self.qsos:
@@ -121,6 +188,20 @@ class Log(object):
                 self.errors[ERR_QSO].extend(qso.errors)
                 self.valid_qsos = False
 
+    def __getstate__(self):
+        # rules are not pickled with the log, use set_rules() after unpickle
+        state = self.__dict__.copy()
+        state['rules'] = None
+        return state
+
+    def set_rules(self, rules):
+        """
+        Set the contest rules for this log and its qsos
+        """
+        self.rules = rules
+        for qso in self.qsos:
+            qso.rules = rules
+
     def validate_header(self):
         """ Validate edi log header.
         If errors are found they will be written in self.errors dictionary
@@ -128,7 +209,10 @@ class Log(object):
         self.valid_header = False
 
         try:
-            self.log_lines = self.read_file_content(self.path)
+            if self.log_lines is None and self.header_only:
+                self.log_lines = self.read_header_content(self.path)
+            elif self.log_lines is None:
+                self.log_lines = self.read_file_content(self.path)
         except Exception as e:
             self.errors[ERR_IO].append((None, 'Cannot read edi log. Error: {}'.format(e)))
             return
@@ -136,13 +220,13 @@ class Log(object):
         if len(self.log_lines) == 0:
             self.errors[ERR_IO].append((None, 'Log is empty'))
             return
+        self.parse_header()
 
+        contest = contest_rules(self.rules)
 
         # get & validate callsign
         _callsign, line_nr = self.get_field('PCall')
-        call_regexp = None
-        if self.rules and self.rules.contest_extra_field_value('callregexp'):
-            call_regexp = '^\\s*(' + self.rules.contest_extra_field_value('callregexp') + ').*'
+        call_pattern = contest.call_pattern if contest else None
 
         if not _callsign:
             self.errors[ERR_HEADER].append((line_nr, 'PCall field is not present'))
@@ -150,7 +234,7 @@ class Log(object):
             self.errors[ERR_HEADER].append((line_nr, 'PCall field is present multiple times'))
         elif not self.validate_callsign(_callsign[0]):
             self.errors[ERR_HEADER].append((line_nr, 'PCall field content is not valid'))
-        elif call_regexp and not re.match(call_regexp, _callsign[0], re.IGNORECASE):
+        elif call_pattern and not regex_match(call_pattern, _callsign[0]):
             self.errors[ERR_HEADER].append((line_nr, 'PCall field content doesn\'t match \'callregexp\' value from rules'))
         else:
             self.callsign = _callsign[0].upper()
@@ -179,6 +263,8 @@ class Log(object):
                                                   'Not as defined in contest rules'.format(_band[0])))
         else:
             self.band = _band[0]
+            if contest:
+                self.band_nrs = tuple(band.nr for band in contest.bands if regex_match(band.log_pattern, self.band))
 
         # get & validate PSect based on generic rules and by custom rules if provided (rules.contest_category['regexp']
         _category, line_nr = self.get_field('PSect')
@@ -224,7 +310,7 @@ class Log(object):
         # validate email from [extra] @ rules
         _email, line_nr = self.get_field('RHBBS')
         _email_valid = False
-        if self.rules and 'email' in self.rules.contest_extra_fields:
+        if contest and 'email' in contest.extra_fields:
             if not _email:
                 self.errors[ERR_HEADER].append((line_nr, 'RHBBS field is not present'))
             elif len(_email) > 1:
@@ -240,7 +326,7 @@ class Log(object):
         # validate address from [extra] @ rules
         _address, line_nr = self.get_field('PAdr1')
         _address_valid = False
-        if self.rules and 'address' in self.rules.contest_extra_fields:
+        if contest and 'address' in contest.extra_fields:
             if not _address:
                 self.errors[ERR_HEADER].append((line_nr, 'PAdr1 field is not present'))
             elif len(_address) > 1:
@@ -256,7 +342,7 @@ class Log(object):
         # validate name from [extra] @ rules
         _name, line_nr = self.get_field('RName')
         _name_valid = False
-        if self.rules and 'name' in self.rules.contest_extra_fields:
+        if contest and 'name' in contest.extra_fields:
             if not _name:
                 self.errors[ERR_HEADER].append((line_nr, 'RName field is not present'))
             elif len(_name) > 1:
@@ -272,7 +358,7 @@ class Log(object):
     @staticmethod
     def read_file_content(path):
         try:
-            with open(path, 'r') as _file:
+            with logarchive.open_text(path) as _file:
                 content = _file.readlines()
         except IOError:
             raise
@@ -280,20 +366,49 @@ class Log(object):
             raise
         return content
 
+    @staticmethod
+    def read_header_content(path):
+        """
+        Read the log lines until [QSORecords, the qso lines are not read
+        """
+        qso_record_start = "[QSORECORDS"
+        content = []
+        with logarchive.open_text(path) as _file:
+            for line in _file:
+                if line[:len(qso_record_start)].upper() == qso_record_start:
+                    break
+                content.append(line)
+        return content
+
+    def parse_header(self):
+        """
+        Read the log header fields in a single pass over the log lines.
+        Reading stops at [QSORecords, the qso lines are not scanned.
+        The result is kept in self.header_fields: {FIELD: ([values], line_number)}
+        """
+        qso_record_start = "[QSORECORDS"
+        self.header_fields = {}
+        for (nr, line_content) in enumerate(self.log_lines):
+            if line_content[:len(qso_record_start)].upper() == qso_record_start:
+                break
+            if '=' not in line_content:
+                continue
+            _field, _value = line_content.split('=', 1)
+            _field = _field.upper()
+            values, _ = self.header_fields.get(_field, ([], None))
+            values.append(_value.strip())
+            self.header_fields[_field] = (values, nr+1)
+
     def get_field(self, field):
         """
-        Search log content for a field
+        Search log header for a field
         :param field: field name (PCall, TDate, ...)
         :return: tuple(value, line_number or None)
         """
-        value = []
-        line_nr = None
-        _field = str(field).upper() + '='
-        for (nr, line_content) in enumerate(self.log_lines):
-            if line_content.upper().startswith(_field):
-                value.append(line_content.split('=', 1)[1].strip())
-                line_nr = nr+1
-        return value, line_nr
+        if self.header_fields is None:
+            self.parse_header()
+        value, line_nr = self.header_fields.get(str(field).upper(), ([], None))
+        return list(value), line_nr
 
     def get_qsos(self):
         """
@@ -317,18 +432,52 @@ class Log(object):
 
         # validate qso lines
         self.qsos = list()
+        self.qsos_index = None
+        self.qsos_index_minutes = None
         for qso in qso_lines:
             self.qsos.append(
                 # REMOVE self.qsos_tuple(linenr=qso[0], qso=qso[1], valid=False if message else True, error=message)
                 LogQso(qso[1], qso[0], self.rules)  # LogQso(qso_line, qso_line_number_in_log)
             )
 
+    def qsos_by_call_period(self):
+        """
+        Index the valid qsos by worked callsign and contest period.
+        The index is built once and reused by cross-check to find the qsos
+        that can confirm a qso from another log.
+        :return: dictionary {(callsign, period_nr): [LogQso, ...] sorted by qso time}
+        """
+        if self.qsos_index is None or self.qsos_index_minutes is None:
+            self.qsos_index = {}
+            for qso in self.qsos:
+                if qso.valid is False or qso.epoch_minute is None:
+                    continue
+                key = (qso.qso_fields['call'].upper(), qso.period_nr)
+                self.qsos_index.setdefault(key, []).append(qso)
+            self.qsos_index_minutes = {}
+            for key, qsos in self.qsos_index.items():
+                qsos.sort(key=attrgetter('epoch_minute'))
+                self.qsos_index_minutes[key] = [qso.epoch_minute for qso in qsos]
+        return self.qsos_index
+
+    def qsos_in_time_window(self, callsign, period_nr, minute, tolerance):
+        """
+        :return: the valid qsos with callsign from period with the qso time
+                 between minute - tolerance and minute + tolerance (sorted by qso time)
+        """
+        key = (callsign, period_nr)
+        qsos = self.qsos_by_call_period().get(key)
+        if not qsos:
+            return []
+        minutes = self.qsos_index_minutes[key]
+        return qsos[bisect_left(minutes, minute - tolerance):bisect_right(minutes, minute + tolerance)]
+
     @staticmethod
     def validate_callsign(callsign):
         if not callsign:
             return False
         regex_pcall = '^\\s*(\\w+[0-9]+\\w+/?\\w*)\\s*$'  # \s*(\w+\d+[a-zA-Z]+(/(M|AM|P|MM))?)\s*$"
-        res = re.match(regex_pcall, callsign)
+        res = regex_match(regex_pcall, callsign)
         return True if res else False
 
     @staticmethod
@@ -336,7 +485,7 @@ class Log(object):
         if not qth:
             return False
         regex_maidenhead = r'^\s*([a-rA-R]{2}\d{2}[a-xA-X]{2})\s*$'
-        res = re.match(regex_maidenhead, qth, re.IGNORECASE)
+        res = regex_match(regex_maidenhead, qth, re.IGNORECASE)
         return True if res else False
 
     @staticmethod
@@ -355,7 +504,7 @@ class Log(object):
                        '1296': ['1296.*', '1[.,][23].*']}
         for _band in regexp_band:
             for regexp in regexp_band[_band]:
-                res = re.match(regexp, band)
+                res = regex_match(regexp, band)
                 if res:
                     return _band
         return None
@@ -373,7 +522,7 @@ class Log(object):
                              '430.*', '432.*', '435.*',
                              '1296.*', '1[.,][23].*']
         for _regex in regexp_band_check:
-            res = re.match(_regex, band_value)
+            res = regex_match(_regex, band_value)
             if res:
                 is_valid = True
         return is_valid
@@ -389,11 +538,10 @@ class Log(object):
 
         if rules is None:
             raise ValueError('No contest rules provided !')
-        for _nr in range(1, rules.contest_bands_nr+1):
-            _regex = r'\s*(' + rules.contest_band(_nr)['regexp'] + r')\s*'
-            res = re.match(_regex, band_value)
-            if res:
+        for band in contest_rules(rules).bands:
+            if regex_match(band.pattern, band_value):
                 is_valid = True
+                break
         return is_valid
 
     @staticmethod
@@ -411,7 +559,7 @@ class Log(object):
         }
         for _cat, _regex_list in regexpCategories.items():
             for _regex in _regex_list:
-                res = re.match(_regex, category_value, re.IGNORECASE)
+                res = regex_match(_regex, category_value, re.IGNORECASE)
                 if res:
                     return True, _cat
         return False, None
@@ -426,11 +574,9 @@ class Log(object):
 
         if rules is None:
             raise ValueError('No contest rules provided !')
-        for _nr in range(1, rules.contest_categories_nr+1):
-            _regex = r'\s*(' + rules.contest_category(_nr)['regexp'] + r')\s*'
-            res = re.match(_regex, category_value, re.IGNORECASE)
-            if res:
-                return True, rules.contest_category(_nr)['name']
+        for category in contest_rules(rules).categories:
+            if regex_match(category.pattern, category_value):
+                return True, category.name
         return False, None
 
     @staticmethod
@@ -459,6 +605,8 @@ class Log(object):
     def validate_email(email):
         if not email:
             return False
+        # imported on first use, the email is validated only if the rules ask for it
+        from validate_email import validate_email
         return validate_email(email)
 
     @staticmethod
@@ -486,25 +634,87 @@ class Log(object):
 
         if rules is None:
             raise ValueError('No contest rules provided !')
+        contest = contest_rules(rules)
         _begin_date, _end_date = date_value.split(';')
-        if _begin_date >= rules.contest_begin_date and _end_date <= rules.contest_end_date:
+        if _begin_date >= contest.begin_date and _end_date <= contest.end_date:
             is_valid = True
 
         return is_valid
 
 
+class QsoFields(Mapping):
+    """
+    Fields of a parsed qso, a compact read/write mapping with a fixed set of keys (see FIELDS).
+    The repeated values (callsign, locator, date, ...) are interned so the qsos share them.
+    """
+    FIELDS = ('date', 'hour', 'call', 'mode', 'rst_sent', 'nr_sent', 'rst_recv', 'nr_recv', 'exchange_recv',
+              'wwl', 'points', 'new_exchange', 'new_wwl', 'new_dxcc', 'duplicate_qso')
+    KEYS = frozenset(FIELDS)
+    __slots__ = FIELDS
+
+    def __init__(self):
+        for key in self.FIELDS:
+            setattr(self, key, None)
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, sys.intern(value) if isinstance(value, str) else value)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def __getstate__(self):
+        return tuple(getattr(self, key) for key in self.FIELDS)
+
+    def __setstate__(self, state):
+        for key, value in zip(self.FIELDS, state):
+            self[key] = value
+
+    def copy(self):
+        """
+        :return: dictionary with the qso fields
+        """
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+
 class LogQso(object):
     """
     Keep a single QSO (in EDI format) and some info:
     qso line number, raw qso, is valid ? , error message if !valid, all qso fields
+    Attributes are kept in __slots__ and the fields in QsoFields, a log can have thousands of qsos.
     """
-    REGEX_MINIMAL_QSO_CHECK = '(?P<date>.*?);(?P<hour>.*?);(?P<call>.*?);(?P<mode>.*?);' \
-                              '(?P<rst_sent>.*?);(?P<nr_sent>.*?);(?P<rst_recv>.*?);(?P<nr_recv>.*?);' \
-                              '(?P<exchange_recv>.*?);(?P<wwl>.*?);(?P<points>.*?);' \
-                              '(?P<new_exchange>.*?);(?P<new_wwl>.*?);(?P<new_dxcc>.*?);(?P<duplicate_qso>.*?)'
+    __slots__ = ('qso_line', 'line_nr', 'rules', 'valid', 'errors', 'cc_confirmed', 'cc_error', 'points',
+                 'epoch_minute', 'period_nr', 'qso_fields')
     REGEX_MEDIUM_QSO_CHECK = '\\d{6};\\d{4};.*?;.?;\\d{2,3}.?;\\d{1,4};\\d{2,3}.?;\\d{1,4};.*?;' \
                              '[a-zA-Z]{2}\\d{2}[a-zA-Z]{2};.*?;.*?;.*?;.*?;.*?'
     #                          date  time   id  m    rst       nr      rst       nr    .  qth  km  .   .   .   .
+    QSO_FIELD_PATTERNS = tuple(re.compile(regex) for regex in REGEX_MEDIUM_QSO_CHECK.split(';'))
+    QSO_LINE_PATTERN = re.compile(REGEX_MEDIUM_QSO_CHECK)
+    QSO_FIELD_NAMES = ('date', 'hour', 'callsign', 'mode', 'rst sent', 'rst send nr', 'rst received',
+                       'rst received nr', 'exchange received', 'wwl', 'points', 'new exchange', 'new wwl',
+                       'new dxcc', 'duplicate_qso')
+    # (qso field, pattern, error message) of the format checks done by generic_qso_validator()
+    RE_RST = re.compile('^[1-5][1-9][1-9]?[aAsS]?$')
+    RE_SENT_RECV_NR = re.compile(r'^\d{1,4}$')
+    GENERIC_QSO_CHECKS = (('call', re.compile(r'^\w+/?\w+$'), 'Callsign is invalid: {}'),
+                          ('mode', re.compile('^[0-9]$'), 'Qso mode is invalid: {}'),
+                          ('rst_sent', RE_RST, 'Rst is invalid: {}'),
+                          ('rst_recv', RE_RST, 'Rst is invalid: {}'),
+                          ('nr_sent', RE_SENT_RECV_NR, 'Sent Qso number is invalid: {}'),
+                          ('nr_recv', RE_SENT_RECV_NR, 'Received Qso number is invalid: {}'),
+                          ('exchange_recv', re.compile(r'^\w{0,6}$'), 'Received exchange is invalid: {}'))
 
     def __init__(self, qso_line=None, qso_line_number=None, rules=None):
         self.qso_line = qso_line
@@ -516,29 +726,17 @@ class LogQso(object):
         self.cc_confirmed = None  # possible values: True, False
         self.cc_error = []  # here we store errors from cross-check
         self.points = None  # if qso is confirmed we store here the calculated points (multiplier included)
+        self.epoch_minute = None  # qso date+hour as epoch minute, see rules.epoch_minute() (if date & hour are valid)
+        self.period_nr = None  # number of the contest period who contains the qso (set by rules validation)
 
-        self.qso_fields = {'date': None,
-                           'hour': None,
-                           'call': None,
-                           'mode': None,
-                           'rst_sent': None,
-                           'nr_sent': None,
-                           'rst_recv': None,
-                           'nr_recv': None,
-                           'exchange_recv': None,
-                           'wwl': None,
-                           'points': None,
-                           'new_exchange': None,
-                           'new_wwl': None,
-                           'new_dxcc': None,
-                           'duplicate_qso': None,
-                           }
+        self.qso_fields = QsoFields()
 
         # 1st validation
-        self.validate_qso_format()
+        fields = self.split_qso_line(self.qso_line)
+        self.validate_qso_format(fields)
         if not self.valid:
             return
-        self.parse_qso_fields()
+        self.parse_qso_fields(fields)
 
         # 2nd validation
         self.generic_qso_validator()
@@ -548,23 +746,49 @@ class LogQso(object):
         if self.rules:
             self.rules_based_qso_validator()
 
-    def validate_qso_format(self):
+    def __getstate__(self):
+        # rules are not pickled with the qso, see Log.set_rules()
+        return tuple(None if key == 'rules' else getattr(self, key) for key in self.__slots__)
+
+    def __setstate__(self, state):
+        for key, value in zip(self.__slots__, state):
+            setattr(self, key, value)
+
+    def validate_qso_format(self, fields=None):
         """ Validate qso line.
         If errors are found they will be written in self.errors string
         """
-        err = self.regexp_qso_validator(self.qso_line) or None
+        if fields is None:
+            fields = self.split_qso_line(self.qso_line)
+        err = self.qso_fields_validator(self.qso_line, fields) or None
         if err:
             self.errors.append((self.line_nr, self.qso_line, err))
             self.valid = False
 
-    def parse_qso_fields(self):
+    def parse_qso_fields(self, fields=None):
         """
         This should parse a qso based on log format
         """
-        res = re.match(self.REGEX_MINIMAL_QSO_CHECK, self.qso_line)
-        if res:
-            for key in self.qso_fields:
-                self.qso_fields[key] = res.group(key)
+        if fields is None:
+            fields = self.split_qso_line(self.qso_line)
+        if fields:
+            for key, value in zip(QsoFields.FIELDS, fields):
+                self.qso_fields[key] = value
+            # the 'duplicate_qso' flag was always parsed empty by the former qso regexp,
+            # keep it so to have the same cross-check results
+            self.qso_fields['duplicate_qso'] = ''
+
+    @staticmethod
+    def split_qso_line(line):
+        """
+        Split a qso line in fields, in a single pass
+        :return: list with the 15 qso fields (the last one keeps the rest of the line) or None
+                 if the line has less fields
+        """
+        fields = line.split(';', len(QsoFields.FIELDS) - 1)
+        if len(fields) < len(QsoFields.FIELDS):
+            return None
+        return fields
 
     @classmethod
     def regexp_qso_validator(cls, line):
@@ -573,22 +797,37 @@ class LogQso(object):
         :param line:
         :return: None or error message
         """
+        return cls.qso_fields_validator(line, cls.split_qso_line(line))
+
+    @classmethod
+    def qso_fields_validator(cls, line, fields):
+        """
+        Validate a qso line already split by split_qso_line()
+        :return: None or error message
+        """
         qso_min_line_length = 40
-        field_names = ('date', 'hour', 'callsign', 'mode', 'rst sent', 'rst send nr', 'rst received', 'rst received nr',
-                       'exchange received', 'wwl', 'points', 'new exchange', 'new wwl', 'new dxcc', 'duplicate_qso')
 
         if len(line) < qso_min_line_length:
             return 'Qso line is too short'
-        res = re.match(cls.REGEX_MINIMAL_QSO_CHECK, line)
-        if not res:
+        if fields is None:
             return 'Incorrect Qso line format (incorrect number of fields).'
-        res = re.match(cls.REGEX_MEDIUM_QSO_CHECK, line)
-        if not res:
-            for (regex, field, name) in zip(cls.REGEX_MEDIUM_QSO_CHECK.split(';'),
-                                            line.split(';'),
-                                            field_names):
-                if not re.match('^'+regex+'$', field):
-                    return 'Qso field <{}> has an invalid value ({})'.format(name, field)
+        for (pattern, field) in zip(cls.QSO_FIELD_PATTERNS, fields):
+            if not pattern.fullmatch(field):
+                return cls.qso_line_validator(line)
+        return None
+
+    @classmethod
+    def qso_line_validator(cls, line):
+        """
+        Validate a qso line who has an invalid field, as the former qso regexp: a '.*?' field can
+        take the extra ';' of a line, such line is accepted and the errors are found by generic_qso_validator()
+        :return: None or error message
+        """
+        if regex_match(cls.QSO_LINE_PATTERN, line):
+            return None
+        for (regex, field, name) in zip(cls.REGEX_MEDIUM_QSO_CHECK.split(';'), line.split(';'), cls.QSO_FIELD_NAMES):
+            if not regex_match('^' + regex + '$', field):
+                return 'Qso field <{}> has an invalid value ({})'.format(name, field)
         return None
 
     def generic_qso_validator(self):
@@ -598,61 +837,25 @@ class LogQso(object):
         """
 
         # validate date format
-        try:
-            datetime.strptime(self.qso_fields['date'], '%y%m%d')
-        except ValueError as why:
+        day, why = parse_qso_date(self.qso_fields['date'])
+        if why:
             self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Qso date is invalid: {}'.format(str(why))))
+            self.errors.append((self.line_nr, self.qso_line, 'Qso date is invalid: {}'.format(why)))
 
         # validate time format
-        try:
-            datetime.strptime(self.qso_fields['hour'], '%H%M')
-        except ValueError as why:
+        minute, why = parse_qso_hour(self.qso_fields['hour'])
+        if why:
             self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Qso hour is invalid: {}'.format(str(why))))
+            self.errors.append((self.line_nr, self.qso_line, 'Qso hour is invalid: {}'.format(why)))
 
-        # validate callsign format
-        re_call = r'^\w+/?\w+$'
-        result = re.match(re_call, self.qso_fields['call'])
-        if not result:
-            self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Callsign is invalid: {}'.format(self.qso_fields['call'])))
-
-        # validate mode format
-        re_mode = "^[0-9]$"
-        result = re.match(re_mode, self.qso_fields['mode'])
-        if not result:
-            self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Qso mode is invalid: {}'.format(self.qso_fields['mode'])))
-
-        # validate RST (sent & recv) format
-        re_rst = "^[1-5][1-9][1-9]?[aAsS]?$"
-        result = re.match(re_rst, self.qso_fields['rst_sent'])
-        if not result:
-            self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Rst is invalid: {}'.format(self.qso_fields['rst_sent'])))
-        result = re.match(re_rst, self.qso_fields['rst_recv'])
-        if not result:
-            self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Rst is invalid: {}'.format(self.qso_fields['rst_recv'])))
-
-        # validate NR (sent & recv) format
-        re_sent_recv_nr = r'^\d{1,4}$'
-        result = re.match(re_sent_recv_nr, self.qso_fields['nr_sent'])
-        if not result:
-            self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Sent Qso number is invalid: {}'.format(self.qso_fields['nr_sent'])))
-        result = re.match(re_sent_recv_nr, self.qso_fields['nr_recv'])
-        if not result:
-            self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Received Qso number is invalid: {}'.format(self.qso_fields['nr_recv'])))
+        if day is not None and minute is not None:
+            self.epoch_minute = day * 1440 + minute
 
-        # validate 'exchange_recv' format
-        re_exchange = r'^\w{0,6}$'
-        result = re.match(re_exchange, self.qso_fields['exchange_recv'])
-        if not result:
-            self.valid = False
-            self.errors.append((self.line_nr, self.qso_line, 'Received exchange is invalid: {}'.format(self.qso_fields['exchange_recv'])))
+        # validate callsign, mode, RST (sent & recv), NR (sent & recv) & 'exchange_recv' format
+        for (field, pattern, message) in self.GENERIC_QSO_CHECKS:
+            if not pattern.match(self.qso_fields[field]):
+                self.valid = False
+                self.errors.append((self.line_nr, self.qso_line, message.format(self.qso_fields[field])))
 
         # validate QTH locator format
         if not Log.validate_qth_locator(self.qso_fields['wwl']):
@@ -674,44 +877,47 @@ class LogQso(object):
         """
         if self.rules is None:
             return
+        contest = contest_rules(self.rules)
+        date = self.qso_fields['date']
+        hour = self.qso_fields['hour']
+        begin_date = contest.begin_date[2:]
+        end_date = contest.end_date[2:]
 
         # if field 'callregexp' from rules file is present, will filter the accepted callsigns in the contest
         # this is usefull for national contests
-        if self.rules.contest_extra_field_value('callregexp'):
-            call_regexp = '^\\s*' + self.rules.contest_extra_field_value('callregexp')
-            if not re.match(call_regexp, self.qso_fields['call'], re.IGNORECASE):
+        if contest.qso_call_pattern:
+            if not contest.qso_call_pattern.match(self.qso_fields['call']):
                 self.valid = False
                 self.errors.append((self.line_nr,
                                     self.qso_line,
                                     'Qso callsign is not accepted based on \'callregexp\' from rules files'))
 
         # validate qso date
-        if self.qso_fields['date'] < self.rules.contest_begin_date[2:]:
+        if date < begin_date:
             self.valid = False
             self.errors.append((self.line_nr,
                                 self.qso_line,
-                                'Qso date is invalid: before contest starts (<{})'.format(self.rules.contest_begin_date[2:])))
-        if self.qso_fields['date'] > self.rules.contest_end_date[2:]:
+                                'Qso date is invalid: before contest starts (<{})'.format(begin_date)))
+        if date > end_date:
             self.valid = False
             self.errors.append((self.line_nr,
                                 self.qso_line,
-                                'Qso date is invalid: after contest ends (>{})'.format(self.rules.contest_end_date[2:])))
+                                'Qso date is invalid: after contest ends (>{})'.format(end_date)))
 
         # validate qso hour
-        if self.qso_fields['date'] == self.rules.contest_begin_date[2:] and \
-           self.qso_fields['hour'] < self.rules.contest_begin_hour:
+        if date == begin_date and hour < contest.begin_hour:
             self.valid = False
             self.errors.append((self.line_nr,
                                 self.qso_line,
-                                'Qso hour is invalid: before contest start hour (<{})'.format(self.rules.contest_begin_hour)))
-        if self.qso_fields['date'] == self.rules.contest_end_date[2:] and self.qso_fields['hour'] > self.rules.contest_end_hour:
+                                'Qso hour is invalid: before contest start hour (<{})'.format(contest.begin_hour)))
+        if date == end_date and hour > contest.end_hour:
             self.valid = False
             self.errors.append((self.line_nr,
                                 self.qso_line,
-                                'Qso hour is invalid: after contest end hour (>{})'.format(self.rules.contest_end_hour)))
+                                'Qso hour is invalid: after contest end hour (>{})'.format(contest.end_hour)))
 
         # validate date & hour based on period
-        inside_period, _ = self.qso_inside_period()
+        inside_period, self.period_nr = self.qso_inside_period()
 
         if not inside_period:
             self.valid = False
@@ -720,9 +926,9 @@ class LogQso(object):
                                 'Qso date/hour is invalid: not inside contest periods'))
 
         # validate qso mode
-        if int(self.qso_fields['mode']) not in self.rules.contest_qso_modes:
+        if int(self.qso_fields['mode']) not in contest.modes_set:
             self.valid = False
-            modes_str = ','.join(map(str, self.rules.contest_qso_modes))
+            modes_str = ','.join(map(str, contest.modes))
             self.errors.append((self.line_nr,
                                 self.qso_line,
                                 'Qso mode is invalid: not in defined modes ({})'.format(modes_str)))
@@ -733,40 +939,15 @@ class LogQso(object):
         :return: True, period_number
                  False, None
         """
-        inside_period = False
-        inside_period_nr = None
-
         if not self.rules:
             return True, None
 
-        for period in range(1, self.rules.contest_periods_nr + 1):
-            # if date is not in period, check next period
-            if not (self.rules.contest_period(period)['begindate'][2:] <= self.qso_fields['date'] <= self.rules.contest_period(period)['enddate'][2:]):
-                continue
-            _enddate = datetime.strptime(self.rules.contest_period(period)['enddate'], '%Y%m%d')
-            _begindate = datetime.strptime(self.rules.contest_period(period)['begindate'], '%Y%m%d')
-            delta_days = _enddate - _begindate
-            # if period is in same day
-            if delta_days == timedelta(0) and self.rules.contest_period(period)['beginhour'] <= self.qso_fields['hour'] <= self.rules.contest_period(period)['endhour']:
-                    inside_period = True
-                    inside_period_nr = period
-                    break
-            # if period is in multiple days
-            elif delta_days > timedelta(0):
-                if self.rules.contest_period(period)['begindate'][2:] == self.qso_fields['date'] and self.rules.contest_period(period)['beginhour'] <= self.qso_fields['hour']:
-                    inside_period = True
-                    inside_period_nr = period
-                    break
-                if self.qso_fields['date'] == self.rules.contest_period(period)['enddate'][2:] and self.qso_fields['hour'] <= self.rules.contest_period(period)['endhour']:
-                    inside_period = True
-                    inside_period_nr = period
-                    break
-                # if begin_period < qso_date < end_period
-                if self.rules.contest_period(period)['begindate'][2:] < self.qso_fields['date'] < self.rules.contest_period(period)['enddate'][2:]:
-                    inside_period = True
-                    inside_period_nr = period
-                    break
-        return inside_period, inside_period_nr
+        if self.epoch_minute is None:
+            return False, None
+        period_nr = contest_rules(self.rules).period_nr(self.epoch_minute)
+        if period_nr is None:
+            return False, None
+        return True, period_nr
 
 
 class LogException(Exception):
@@ -775,57 +956,90 @@ class LogException(Exception):
         self.line = line
 
 
-def crosscheck_logs_filter(log_class, rules=None, logs_folder=None, checklogs_folder=None):
+def crosscheck_logs_filter(log_class, rules=None, logs_folder=None, checklogs_folder=None, cache=None, jobs=1):
+    """
+    Read all logs and checklogs, cross-check them and calculate the points
+    :param log_class: class used to parse a log (edi.Log)
+    :param logs_folder, checklogs_folder: folder or archive (.zip, .tar, .tar.gz) with logs
+    :param cache: optional logcache.LogCache instance used to load the logs
+    :param jobs: number of processes used to parse the logs
+    :return: dictionary {key=callsign, value=Operator(callsign)}
+    """
+    # the archives are read only until the logs are loaded & marked
+    with logarchive.closing_archives():
+        logs_paths = crosscheck_logs_paths(rules, logs_folder, checklogs_folder)
+        if logs_paths is None:
+            return {}
 
-    ignored_logs = []
+        logs_instances = load_logs(log_class, logs_paths, rules=rules, cache=cache, jobs=jobs)
+        operator_instances = operators_from_logs(logs_instances)
 
+        # if we find multiple logs for a ham on a band
+        # we set Log.ignore_this_log for older files
+        for band in contest_rules(rules).bands:
+            for _, _ham in operator_instances.items():
+                _logs = _ham.logs_by_band(band.nr)
+                mark_older_logs(_logs)
+
+    # do the corss-check over filtered logs
+    for band in contest_rules(rules).bands:
+        crosscheck_logs(operator_instances, rules, band.nr)
+
+    # calculate points in every logs
+    score_logs(operator_instances.values())
+
+    return operator_instances
+
+
+def crosscheck_logs_paths(rules, logs_folder, checklogs_folder=None):
+    """
+    :return: list with tuple(path, checklog) for all logs and checklogs or None (the reason is printed)
+    """
     if not rules:
         print('No rules were provided')
-        return {}
-    # create instances for all logs
-    logs_instances = []
+        return None
+    logs_paths = []
     if not logs_folder:
         print('Logs folder was not provided')
-        return {}
-    if logs_folder and not os.path.isdir(logs_folder):
+        return None
+    if logs_folder and not logarchive.is_logs_folder(logs_folder):
         print('Cannot open logs folder : {}'.format(logs_folder))
-        return {}
-    for filename in os.listdir(logs_folder):
-        logs_instances.append(log_class(os.path.join(logs_folder, filename), rules=rules))
+        return None
+    for filename in logarchive.listdir(logs_folder):
+        logs_paths.append((os.path.join(logs_folder, filename), False))
 
     if checklogs_folder:
-        if os.path.isdir(checklogs_folder):
-            for filename in os.listdir(checklogs_folder):
-                logs_instances.append(log_class(os.path.join(checklogs_folder, filename), rules=rules, checklog=True))
+        if logarchive.is_logs_folder(checklogs_folder):
+            for filename in logarchive.listdir(checklogs_folder):
+                logs_paths.append((os.path.join(checklogs_folder, filename), True))
         else:
             print('Cannot open checklogs folder : {}'.format(checklogs_folder))
-            return {}
+            return None
+    return logs_paths
+
 
-    # create instances for all hams and add logs with valid header
+def operators_from_logs(logs_instances):
+    """
+    Create instances for all hams and add logs with valid header, logs with invalid header are ignored
+    :return: dictionary {key=callsign, value=Operator(callsign)}
+    """
     operator_instances = {}
     for log in logs_instances:
         if not log.valid_header:
             log.ignore_this_log = True
-            ignored_logs.append(log)
             continue
         callsign = log.callsign.upper()
         if not operator_instances.get(callsign, None):
             operator_instances[callsign] = Operator(callsign)
         operator_instances[callsign].add_log_instance(log)
+    return operator_instances
 
-    # if we find multiple logs for a ham on a band
-    # we set Log.ignore_this_log for older files
-    for band in range(1, rules.contest_bands_nr+1):
-        for _, _ham in operator_instances.items():
-            _logs = _ham.logs_by_band_regexp(rules.contest_band(band)['regexp'])
-            mark_older_logs(_logs)
-
-    # do the corss-check over filtered logs
-    for band in range(1, rules.contest_bands_nr+1):
-        crosscheck_logs(operator_instances, rules, band)
 
-    # calculate points in every logs
-    for op, op_inst in operator_instances.items():
+def score_logs(operators):
+    """
+    Calculate the points & confirmed qsos in every log of operators
+    """
+    for op_inst in operators:
         for log in op_inst.logs:
             points = 0
             confirmed = 0
@@ -836,19 +1050,265 @@ def crosscheck_logs_filter(log_class, rules=None, logs_folder=None, checklogs_fo
             log.qsos_points = points
             log.qsos_confirmed = confirmed
 
-    return operator_instances
+
+class IncrementalCrosscheck(object):
+    """
+    Cross-check that keeps the logs & results of the previous run.
+    At update() only new or changed logs are parsed and only the qsos
+    who involve the callsigns with added, replaced or removed logs are checked again.
+    The results are the same as crosscheck_logs_filter() results.
+    """
+    STATE_VERSION = 2  # increase it when the layout of the pickled logs is changed
+    version = None
+    log_class = None
+    rules = None
+    rules_hash = None
+    cache = None
+    jobs = 1
+    logs = None  # {path: log instance}
+    logs_fingerprints = None  # {path: (checklog, size, mtime)}
+    operator_instances = None
+    changed_callsigns = None  # callsigns checked again at last update (None = all)
+
+    def __init__(self, log_class, rules, cache=None, jobs=1):
+        self.version = self.STATE_VERSION
+        self.log_class = log_class
+        self.rules = rules
+        self.rules_hash = rules.fingerprint() if rules else None
+        self.cache = cache
+        self.jobs = jobs
+        self.logs = {}
+        self.logs_fingerprints = {}
+
+    def __getstate__(self):
+        # rules & cache are not pickled, see load()
+        state = self.__dict__.copy()
+        state['rules'] = None
+        state['cache'] = None
+        return state
+
+    @classmethod
+    def load(cls, path, log_class, rules, cache=None, jobs=1):
+        """
+        Load the state saved by save() or create a new instance
+        if the state is missing, unreadable, outdated or was saved with other rules
+        """
+        import pickle
+        try:
+            with open(path, 'rb') as _file:
+                crosscheck = pickle.load(_file)
+        except Exception:
+            return cls(log_class, rules, cache=cache, jobs=jobs)
+        if not isinstance(crosscheck, cls) or crosscheck.version != cls.STATE_VERSION or \
+                crosscheck.rules_hash != rules.fingerprint() or crosscheck.log_class is not log_class:
+            return cls(log_class, rules, cache=cache, jobs=jobs)
+        crosscheck.rules = rules
+        crosscheck.cache = cache
+        crosscheck.jobs = jobs
+        for log in crosscheck.logs.values():
+            log.set_rules(rules)
+        return crosscheck
+
+    def save(self, path):
+        import pickle
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as _file:
+            pickle.dump(self, _file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def log_fingerprint(path, checklog):
+        try:
+            return (checklog,) + logarchive.stat(path)
+        except Exception:
+            return None
+
+    def update(self, logs_folder, checklogs_folder=None):
+        """
+        Cross-check the logs from folders, using the results of the previous update
+        :return: dictionary {key=callsign, value=Operator(callsign)}
+        """
+        # the archives are read only until the logs are loaded & marked
+        with logarchive.closing_archives():
+            logs_paths = crosscheck_logs_paths(self.rules, logs_folder, checklogs_folder)
+            if logs_paths is None:
+                return {}
+
+            # parse only new & changed logs
+            fingerprints = {path: self.log_fingerprint(path, checklog) for path, checklog in logs_paths}
+            changed_paths = [(path, checklog) for path, checklog in logs_paths
+                             if fingerprints[path] is None or fingerprints[path] != self.logs_fingerprints.get(path)]
+            changed_logs = load_logs(self.log_class, changed_paths, rules=self.rules, cache=self.cache, jobs=self.jobs)
+            logs = dict(self.logs)
+            logs.update(zip((path for path, _ in changed_paths), changed_logs))
+            self.logs = {path: logs[path] for path, _ in logs_paths}
+            self.logs_fingerprints = fingerprints
+
+            old_operators = self.operator_instances
+            self.operator_instances = operators_from_logs(self.logs.values())
+            if old_operators is None:
+                self.changed_callsigns = None
+                recheck = self.operator_instances
+            else:
+                # callsigns whose logs were added, replaced or removed
+                self.changed_callsigns = {callsign for callsign in set(old_operators) | set(self.operator_instances)
+                                          if self.logs_ids(old_operators.get(callsign)) !=
+                                          self.logs_ids(self.operator_instances.get(callsign))}
+                recheck = {callsign: self.operator_instances[callsign] for callsign in self.changed_callsigns
+                           if callsign in self.operator_instances}
+
+            # mark the older logs again for the operators with changed logs
+            bands = contest_rules(self.rules).bands
+            for _ham in recheck.values():
+                for log in _ham.logs:
+                    log.ignore_this_log = False
+            for band in bands:
+                for _ham in recheck.values():
+                    mark_older_logs(_ham.logs_by_band(band.nr))
+
+        # reset the results of the qsos to check again
+        rescore = set(recheck)
+        for callsign, _ham in self.operator_instances.items():
+            for log in _ham.logs:
+                for qso in log.qsos:
+                    if callsign in recheck or (qso.valid is not False and
+                                               qso.qso_fields['call'].upper() in self.changed_callsigns):
+                        qso.cc_confirmed = None
+                        qso.cc_error = []
+                        qso.points = None
+                        rescore.add(callsign)
+
+        for band in bands:
+            crosscheck_logs(self.operator_instances, self.rules, band.nr, callsigns=self.changed_callsigns)
+        score_logs(self.operator_instances[callsign] for callsign in rescore)
+        return self.operator_instances
+
+    @staticmethod
+    def logs_ids(operator):
+        return tuple(id(log) for log in operator.logs) if operator else ()
+
+
+def contest_rules(rules):
+    """
+    :param rules: rules.Rules or rules.ContestRules instance
+    :return: the compiled rules snapshot (rules.ContestRules) or None
+    """
+    if rules is None:
+        return None
+    return getattr(rules, 'snapshot', rules)
+
+
+def load_log(log_class, path, rules=None, checklog=False, cache=None):
+    """
+    Create a log instance, from cache if one is provided
+    """
+    if cache is not None:
+        return cache.load_log(log_class, path, rules=rules, checklog=checklog)
+    return log_class(path, rules=rules, checklog=checklog)
+
+
+# settings of a worker process, set by init_logs_worker()
+_logs_worker = {}
+
+
+def init_logs_worker(log_class, rules, cache, header_only=False):
+    _logs_worker.update(log_class=log_class, rules=rules, cache=cache, header_only=header_only)
+
+
+def load_logs_worker(log_path):
+    path, checklog = log_path
+    return load_log(_logs_worker['log_class'], path, rules=_logs_worker['rules'], checklog=checklog,
+                    cache=_logs_worker['cache'])
 
 
-def crosscheck_logs(operator_instances, rules, band_nr):
+def check_logs_worker(log_path):
+    path, checklog = log_path
+    return check_log(_logs_worker['log_class'], path, rules=_logs_worker['rules'], checklog=checklog,
+                     header_only=_logs_worker['header_only'])
+
+
+def ordered_map(func, items, jobs, initializer=None, initargs=()):
+    """
+    Run func(item) in a process pool and yield the results in items order.
+    Only a limited number of items are submitted ahead of the 1st unfinished one,
+    so the finished results kept in memory don't grow with the number of items.
+    """
+    # imported on first use, the process pool is used only with jobs > 1
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= jobs * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def load_logs(log_class, logs_paths, rules=None, cache=None, jobs=1):
+    """
+    Create log instances, in parallel processes if jobs > 1
+    :param logs_paths: list with tuple(path, checklog)
+    :param jobs: number of processes used to parse the logs
+    :return: list with log instances, in same order as logs_paths
+    """
+    if jobs <= 1 or len(logs_paths) < 2:
+        return [load_log(log_class, path, rules=rules, checklog=checklog, cache=cache)
+                for path, checklog in logs_paths]
+
+    logs = list(ordered_map(load_logs_worker, logs_paths, jobs,
+                            initializer=init_logs_worker, initargs=(log_class, rules, cache)))
+    # rules are not pickled back from workers
+    for log in logs:
+        log.set_rules(rules)
+    return logs
+
+
+def check_log(log_class, path, rules=None, checklog=False, header_only=False, lines=None):
+    """
+    Validate a log
+    :param header_only: validate only the log header
+    :param lines: log content as list of lines, if set the log is not read from path
+    :return: dictionary with log file name and log errors
+    """
+    log = log_class(path, rules=rules, checklog=checklog, header_only=header_only, lines=lines)
+    log_output = {INFO_LOG: os.path.basename(path)}
+    log_output.update(log.errors)
+    return log_output
+
+
+def check_logs(log_class, logs_paths, rules=None, jobs=1, header_only=False):
+    """
+    Validate logs, in parallel processes if jobs > 1
+    :param logs_paths: list with tuple(path, checklog)
+    :param header_only: validate only the logs header
+    :return: generator with check_log() results, in same order as logs_paths
+    """
+    with logarchive.closing_archives():
+        if jobs <= 1:
+            for path, checklog in logs_paths:
+                yield check_log(log_class, path, rules=rules, checklog=checklog, header_only=header_only)
+        else:
+            yield from ordered_map(check_logs_worker, logs_paths, jobs,
+                                   initializer=init_logs_worker, initargs=(log_class, rules, None, header_only))
+
+
+def crosscheck_logs(operator_instances, rules, band_nr, callsigns=None):
     """
     :param operator_instances: dictionary {key=callsign, value=Operator(callsign)}
     :param band_nr: number of contest band
+    :param callsigns: if set, only the qsos of these callsigns and the qsos with these callsigns are checked
     """
+    contest = contest_rules(rules)
+    band = contest.bands[band_nr-1]
+    confirmed_qsos = []
+    locators = []  # (log1 locator, log2 locator) for every confirmed qso
+    compared = {}  # {(id(qso1), id(qso2)): True/False} qsos compared from the other side
     for callsign1, ham1 in operator_instances.items():
-        # set a list for this ham with already made contacts
-        _had_qso_with = []
+        # keep for this ham the already made contacts
+        _had_qso_with = set()
         # get logs for band
-        _logs1 = ham1.logs_by_band_regexp(rules.contest_band(band_nr)['regexp'])
+        _logs1 = ham1.logs_by_band(band_nr)
         if not _logs1:
             continue
 
@@ -861,7 +1321,11 @@ def crosscheck_logs(operator_instances, rules, band_nr):
         else:
             continue
 
+        check_all_qsos = callsigns is None or callsign1 in callsigns
         for qso1 in log1.qsos:
+            if not check_all_qsos and (qso1.valid is False or qso1.qso_fields['call'].upper() not in callsigns):
+                continue
+
             if qso1.valid is False:
                 qso1.cc_confirmed = False
                 if len(qso1.errors) >= 1:
@@ -877,7 +1341,7 @@ def crosscheck_logs(operator_instances, rules, band_nr):
             callsign2 = qso1.qso_fields['call'].upper()
 
             # validate that this qso isn't an duplicate for current period
-            _, inside_period_nr1 = qso1.qso_inside_period()
+            inside_period_nr1 = qso1.period_nr
             if '{}-period{}'.format(callsign2, inside_period_nr1) in _had_qso_with:
                 qso1.cc_confirmed = False
                 qso1.cc_error = 'Qso already confirmed'
@@ -891,7 +1355,7 @@ def crosscheck_logs(operator_instances, rules, band_nr):
                 continue
 
             # check if we have proper band logs from 2nd ham
-            _logs2 = ham2.logs_by_band_regexp(rules.contest_band(band_nr)['regexp'])
+            _logs2 = ham2.logs_by_band(band_nr)
             if not _logs2:
                 qso1.cc_confirmed = False
                 qso1.cc_error = 'No log for this band from {}'.format(callsign2)
@@ -907,32 +1371,25 @@ def crosscheck_logs(operator_instances, rules, band_nr):
                 qso1.cc_error = 'No valid log from {}'.format(callsign2)
                 continue
 
-            # get 2nd ham qsos and compare them with 1st ham qso
-            for qso2 in log2.qsos:
-                if qso2.valid is False:
-                    continue
-
-                _callsign2 = qso2.qso_fields['call'].upper()
-                if callsign1 != _callsign2:
-                    continue
-
-                _, inside_period_nr2 = qso2.qso_inside_period()
-                if inside_period_nr1 != inside_period_nr2:
-                    continue
-
-                distance = None
-                try:
-                    distance = compare_qso(log1, qso1, log2, qso2)
-                except ValueError as e:
+            # get 2nd ham valid qsos with 1st ham from same period and compare them with 1st ham qso
+            for qso2 in log2.qsos_in_time_window(callsign1, inside_period_nr1, qso1.epoch_minute,
+                                                 contest.qso_time_tolerance):
+                matched = compared.pop((id(qso1), id(qso2)), None)
+                if matched is None:
+                    result = match_qso(log1, qso1, log2, qso2, time_tolerance=contest.qso_time_tolerance)
+                    matched = result.matched
+                    if not matched:
+                        qso1.cc_error = result.message
+                    # qsos match is symmetric, the result is reused when 2nd ham log is cross-checked
+                    compared[(id(qso2), id(qso1))] = matched
+                if not matched:
                     qso1.cc_confirmed = False
-                    qso1.cc_error = e
-
-                if distance is None:
                     continue
 
-                # add this qso in _had_qso_with list
-                _had_qso_with.append('{}-period{}'.format(callsign2, inside_period_nr2))
-                qso1.points = distance * int(rules.contest_band(band_nr)['multiplier'])
+                # add this qso in _had_qso_with set
+                _had_qso_with.add('{}-period{}'.format(callsign2, inside_period_nr1))
+                confirmed_qsos.append(qso1)
+                locators.append((log1.maidenhead_locator.upper(), log2.maidenhead_locator.upper()))
                 qso1.cc_confirmed = True
                 qso1.cc_error = []
                 break
@@ -940,6 +1397,10 @@ def crosscheck_logs(operator_instances, rules, band_nr):
                 qso1.cc_confirmed = False
                 qso1.cc_error = 'No qso found on {} log'.format(callsign2)
 
+    # points of confirmed qsos are calculated in a single batch
+    for qso, distance in zip(confirmed_qsos, batch_qth_distance(locators)):
+        qso.points = distance * band.multiplier
+
 
 def compare_qso(log1, qso1, log2, qso2):
     """
@@ -947,79 +1408,130 @@ def compare_qso(log1, qso1, log2, qso2):
     :param qso1:
     :param qso2:
     :return: distance if QSO's are valid or -1/None
+    :raise: ValueError with the reason why the QSO's don't match, see match_qso()
     """
+    result = match_qso(log1, qso1, log2, qso2, distance=True)
+    if not result.matched:
+        raise ValueError(result.message)
+    return result.distance
+
 
+QsoMatch = namedtuple('QsoMatch', ['matched', 'code', 'message', 'distance'])
+QSO_MATCH = QsoMatch(matched=True, code=None, message=None, distance=None)
+
+# mismatch reason codes (QsoMatch.code)
+MISMATCH_INVALID = 'invalid'
+MISMATCH_OTHER_INVALID = 'other_invalid'
+MISMATCH_CALLSIGN = 'callsign'
+MISMATCH_DATE_FORMAT = 'date_format'
+MISMATCH_HOUR_FORMAT = 'hour_format'
+MISMATCH_TIME = 'time'
+MISMATCH_MODE = 'mode'
+MISMATCH_RST_OTHER = 'rst_other'
+MISMATCH_RST = 'rst'
+MISMATCH_SERIAL_OTHER = 'serial_other'
+MISMATCH_SERIAL = 'serial'
+MISMATCH_QTH_OTHER = 'qth_other'
+MISMATCH_QTH = 'qth'
+
+
+def qso_mismatch(code, message):
+    return QsoMatch(matched=False, code=code, message=message, distance=None)
+
+
+def match_qso(log1, qso1, log2, qso2, distance=False, time_tolerance=DEFAULT_QSO_TIME_TOLERANCE):
+    """
+    Compare 2 QSO's without raising exceptions
+    :param distance: if True the distance is calculated for matching QSO's
+    :param time_tolerance: max difference (in minutes) between the QSO's times
+    :return: QsoMatch(matched=True, distance=km or None)
+             or QsoMatch(matched=False, code=MISMATCH_..., message='reason')
+    """
     if qso1.valid is False:
         # pass only 1st error message
-        raise ValueError(qso1.errors[0][2])
+        return qso_mismatch(MISMATCH_INVALID, qso1.errors[0][2] if qso1.errors else 'Qso is not valid')
 
     if qso2.valid is False:
-        raise(ValueError('Other ham qso is invalid'))
+        return qso_mismatch(MISMATCH_OTHER_INVALID, 'Other ham qso is invalid')
+
+    fields1 = qso1.qso_fields
+    fields2 = qso2.qso_fields
 
     # compare callsign
-    if log1.callsign != qso2.qso_fields['call'] or log2.callsign != qso1.qso_fields['call']:
-        raise ValueError('Callsign mismatch')  # this is never raised
-
-    # calculate absolute date+time
-    REGEX_DATE = '(?P<year>\\d{2})(?P<month>\\d{2})(?P<day>\\d{2})'
-    REGEX_HOUR = '(?P<hour>\\d{2})(?P<minute>\\d{2})'
-
-    date_res1 = re.match(REGEX_DATE, qso1.qso_fields['date'])
-    if not date_res1:
-        raise ValueError('Date format is invalid : {}'.format(qso1.qso_fields['date']))
-    hour_res1 = re.match(REGEX_HOUR, qso1.qso_fields['hour'])
-    if not hour_res1:
-        raise ValueError('Hour format is invalid : {}'.format(qso1.qso_fields['hour']))
-    absolute_time1 = datetime(int(date_res1.group('year')), int(date_res1.group('month')), int(date_res1.group('day')),
-                              int(hour_res1.group('hour')), int(hour_res1.group('minute')))
-
-    date_res2 = re.match(REGEX_DATE, qso2.qso_fields['date'])
-    if not date_res2:
-        raise ValueError('Date format is invalid : {}'.format(qso2.qso_fields['date']))
-    hour_res2 = re.match(REGEX_HOUR, qso2.qso_fields['hour'])
-    if not hour_res2:
-        raise ValueError('Hour format is invalid : {}'.format(qso2.qso_fields['hour']))
-    absolute_time2 = datetime(int(date_res2.group('year')), int(date_res2.group('month')), int(date_res2.group('day')),
-                              int(hour_res2.group('hour')), int(hour_res2.group('minute')))
-
-    # check if time1 and time2 difference is less than 5 minutes
-    if abs(absolute_time1 - absolute_time2) > timedelta(minutes=5):
-        raise ValueError('Different date/time between qso\'s')
+    if log1.callsign != fields2['call'] or log2.callsign != fields1['call']:
+        return qso_mismatch(MISMATCH_CALLSIGN, 'Callsign mismatch')  # this is never returned
+
+    # check if time1 and time2 difference is less than time_tolerance (5 minutes)
+    for qso in (qso1, qso2):
+        if qso.epoch_minute is None:
+            if parse_qso_date(qso.qso_fields['date'])[0] is None:
+                return qso_mismatch(MISMATCH_DATE_FORMAT, 'Date format is invalid : {}'.format(qso.qso_fields['date']))
+            return qso_mismatch(MISMATCH_HOUR_FORMAT, 'Hour format is invalid : {}'.format(qso.qso_fields['hour']))
+    if abs(qso1.epoch_minute - qso2.epoch_minute) > time_tolerance:
+        return qso_mismatch(MISMATCH_TIME, 'Different date/time between qso\'s')
 
     # compare mode
-    if qso1.qso_fields['mode'] != qso2.qso_fields['mode']:
-        raise ValueError('Mode mismatch')
+    if fields1['mode'] != fields2['mode']:
+        return qso_mismatch(MISMATCH_MODE, 'Mode mismatch')
     # compare rst
-    if qso1.qso_fields['rst_sent'] != qso2.qso_fields['rst_recv']:
-        raise ValueError('Rst mismatch (other ham)')
-    if qso1.qso_fields['rst_recv'] != qso2.qso_fields['rst_sent']:
-        raise ValueError('Rst mismatch')
+    if fields1['rst_sent'] != fields2['rst_recv']:
+        return qso_mismatch(MISMATCH_RST_OTHER, 'Rst mismatch (other ham)')
+    if fields1['rst_recv'] != fields2['rst_sent']:
+        return qso_mismatch(MISMATCH_RST, 'Rst mismatch')
 
     # compare serial number
-    if int(qso1.qso_fields['nr_sent']) != int(qso2.qso_fields['nr_recv']):
-        raise ValueError('Serial number mismatch (other ham)')
-    if int(qso1.qso_fields['nr_recv']) != int(qso2.qso_fields['nr_sent']):
-        raise ValueError('Serial number mismatch')
+    if int(fields1['nr_sent']) != int(fields2['nr_recv']):
+        return qso_mismatch(MISMATCH_SERIAL_OTHER, 'Serial number mismatch (other ham)')
+    if int(fields1['nr_recv']) != int(fields2['nr_sent']):
+        return qso_mismatch(MISMATCH_SERIAL, 'Serial number mismatch')
 
     # compare qth
-    if log1.maidenhead_locator.upper() != qso2.qso_fields['wwl'].upper():
-        raise ValueError('Qth locator mismatch (other ham)')
-    if log2.maidenhead_locator.upper() != qso1.qso_fields['wwl'].upper():
-        raise ValueError('Qth locator mismatch')
+    if log1.maidenhead_locator.upper() != fields2['wwl'].upper():
+        return qso_mismatch(MISMATCH_QTH_OTHER, 'Qth locator mismatch (other ham)')
+    if log2.maidenhead_locator.upper() != fields1['wwl'].upper():
+        return qso_mismatch(MISMATCH_QTH, 'Qth locator mismatch')
+
+    if not distance:
+        return QSO_MATCH
+    return QSO_MATCH._replace(distance=qth_distance(log1.maidenhead_locator.upper(), log2.maidenhead_locator.upper()))
 
-    # calculate & return distance
-    return qth_distance(log1.maidenhead_locator.upper(), log2.maidenhead_locator.upper())
+
+@lru_cache(maxsize=1024)
+def parse_qso_date(date):
+    """
+    Parse a qso date, a contest has only a few distinct dates so the results are memoized
+    :param date: 'yymmdd'
+    :return: tuple(day number (see datetime.toordinal()), None) or tuple(None, error message)
+    """
+    try:
+        return datetime.strptime(date, '%y%m%d').toordinal(), None
+    except ValueError as why:
+        return None, str(why)
+
+
+@lru_cache(maxsize=2048)
+def parse_qso_hour(hour):
+    """
+    Parse a qso hour, the results are memoized (a day has 1440 minutes)
+    :param hour: 'HHMM'
+    :return: tuple(minute of the day, None) or tuple(None, error message)
+    """
+    try:
+        moment = datetime.strptime(hour, '%H%M')
+    except ValueError as why:
+        return None, str(why)
+    return moment.hour * 60 + moment.minute, None
 
 
 def mark_older_logs(log_list):
     """
-    Will iterate the log list and based on log file timestamp will mark older ones
+    Will iterate the log list and based on log file timestamp (or archive entry time) will mark older ones
     by setting the .ignore_this_log flag.
     """
     maxDate = 0
     maxDateLogId = None
     for log in log_list:
-        date = os.path.getmtime(log.path)
+        date = logarchive.getmtime(log.path)
         if date > maxDate:
             maxDate = date
             maxDateLogId = id(log)
@@ -1051,29 +1563,29 @@ def conv_maidenhead_to_latlong(maiden):
     return long, lat
 
 
-def qth_distance(qth1, qth2):
-    """
-    Math to calculate the distance (in kilometers) between 2 Maindehead locators
-    see : https://en.wikipedia.org/wiki/Maidenhead_Locator_System
-    """
-    if qth1 == qth2:
-        return 1
+QTH_CACHE_SIZE = 4096  # max number of locators kept by locator_radians()
+DISTANCE_CACHE_SIZE = 65536  # max number of locator pairs kept by locators_distance()
+BATCH_DISTANCE_MIN_PAIRS = 64  # batch_qth_distance() uses NumPy starting with this number of pairs
 
-    # Convert Maidenhead to latitude and longitude
-    long1, lat1 = conv_maidenhead_to_latlong(qth1)
-    long2, lat2 = conv_maidenhead_to_latlong(qth2)
 
-    # Convert latitude and longitude to
-    # spherical coordinates in radians.
+@lru_cache(maxsize=QTH_CACHE_SIZE)
+def locator_radians(qth):
+    """
+    Convert a Maidenhead locator to spherical coordinates in radians
+    :return: tuple(phi, theta), phi = 90 - latitude, theta = longitude
+    """
+    long, lat = conv_maidenhead_to_latlong(qth)
     degrees_to_radians = math.pi/180.0
+    return (90.0 - lat)*degrees_to_radians, long*degrees_to_radians
 
-    # phi = 90 - latitude
-    phi1 = (90.0 - lat1)*degrees_to_radians
-    phi2 = (90.0 - lat2)*degrees_to_radians
 
-    # theta = longitude
-    theta1 = long1*degrees_to_radians
-    theta2 = long2*degrees_to_radians
+@lru_cache(maxsize=DISTANCE_CACHE_SIZE)
+def locators_distance(qth1, qth2):
+    """
+    Distance (in kilometers) between 2 different Maidenhead locators, see qth_distance()
+    """
+    phi1, theta1 = locator_radians(qth1)
+    phi2, theta2 = locator_radians(qth2)
 
     # Compute spherical distance from spherical coordinates.
 
@@ -1095,9 +1607,259 @@ def qth_distance(qth1, qth2):
         #return arc*6373
 
 
+def qth_distance(qth1, qth2):
+    """
+    Math to calculate the distance (in kilometers) between 2 Maindehead locators
+    see : https://en.wikipedia.org/wiki/Maidenhead_Locator_System
+    Locators coordinates and distances are cached, the distance is symmetric
+    so (qth1, qth2) and (qth2, qth1) share the same cache entry.
+    """
+    if qth1 == qth2:
+        return 1
+    if qth1 > qth2:
+        qth1, qth2 = qth2, qth1
+    return locators_distance(qth1, qth2)
+
+
+def batch_qth_distance(pairs):
+    """
+    Calculate the distances for a list of locator pairs, same results as qth_distance().
+    With NumPy the distances are calculated in a single vectorized pass,
+    without NumPy (or for a few pairs) qth_distance() is used for every pair.
+    :param pairs: list with tuple(qth1, qth2)
+    :return: list with distances (in kilometers)
+    """
+    if len(pairs) < BATCH_DISTANCE_MIN_PAIRS or import_numpy() is None:
+        return [qth_distance(qth1, qth2) for qth1, qth2 in pairs]
+
+    coordinates = numpy.array([locator_radians(qth1) + locator_radians(qth2) for qth1, qth2 in pairs])
+    phi1, theta1, phi2, theta2 = coordinates.T
+    cos = numpy.sin(phi1)*numpy.sin(phi2)*numpy.cos(theta1 - theta2) + numpy.cos(phi1)*numpy.cos(phi2)
+    arc = numpy.arccos(numpy.clip(cos, -1.0, 1.0))
+    # numpy.rint() rounds half to even, same as round()
+    distances = numpy.rint(arc*6373).astype(int)
+    distances[distances == 0] = 1
+    return distances.tolist()
+
+
+def import_numpy():
+    """
+    Import NumPy on first use, it's an optional dependency used only by batch_qth_distance()
+    :return: numpy module or None if NumPy is not installed
+    """
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as _numpy
+        except ImportError:
+            _numpy = None
+        numpy = _numpy
+    return numpy
+
+
+def distance_cache_info():
+    """
+    :return: dictionary with the hits/misses/size of locators & distances caches
+    """
+    return {'locators': locator_radians.cache_info()._asdict(),
+            'distances': locators_distance.cache_info()._asdict()}
+
+
+def distance_cache_clear():
+    locator_radians.cache_clear()
+    locators_distance.cache_clear()
+
+
 def dict_to_json(dictionary):
     return json.dumps(dictionary)
 
 
 def dict_to_xml(dictionary):
-    return dicttoxml(dictionary)
+    """
+    Serialize a dictionary to XML, with same elements as the former dicttoxml output:
+    <root> element, a 'type' attribute for every element and <item> elements for list items
+    :return: bytes
+    """
+    return (XML_DECLARATION + '<root>' + xml_dict_content(dictionary) + '</root>').encode('utf-8')
+
+
+def json_stream(head, key, items):
+    """
+    Serialize {**head, key: list(items)} to JSON, one item at a time.
+    The result is the same as dict_to_json() but items are not kept in memory.
+    :return: generator with str chunks
+    """
+    yield json.dumps(head)[:-1] + ', ' if head else '{'
+    yield json.dumps(key) + ': ['
+    for nr, item in enumerate(items):
+        yield (', ' if nr else '') + json.dumps(item)
+    yield ']}'
+
+
+def json_dict_stream(head, key, items):
+    """
+    Serialize {**head, key: dict(items)} to JSON, one (key, value) item at a time.
+    The result is the same as dict_to_json() but the values are not kept in memory.
+    :param items: iterable with tuple(key, value)
+    :return: generator with str chunks
+    """
+    yield json.dumps(head)[:-1] + ', ' if head else '{'
+    yield json.dumps(key) + ': {'
+    for nr, (item_key, value) in enumerate(items):
+        yield (', ' if nr else '') + json.dumps({item_key: value})[1:-1]
+    yield '}}'
+
+
+def xml_stream(head, key, items):
+    """
+    Serialize {**head, key: list(items)} to XML, one item at a time.
+    The result is the same as dict_to_xml() but items are not kept in memory.
+    :return: generator with bytes chunks
+    """
+    name, attributes = xml_element_name(key)
+    yield (XML_DECLARATION + '<root>' + xml_dict_content(head)).encode('utf-8')
+    yield '<{}{} type="list">'.format(name, attributes).encode('utf-8')
+    for item in items:
+        yield xml_item(item).encode('utf-8')
+    yield '</{}></root>'.format(name).encode('utf-8')
+
+
+def xml_dict_stream(head, key, items):
+    """
+    Serialize {**head, key: dict(items)} to XML, one (key, value) item at a time.
+    The result is the same as dict_to_xml() but the values are not kept in memory.
+    :param items: iterable with tuple(key, value)
+    :return: generator with bytes chunks
+    """
+    name, attributes = xml_element_name(key)
+    yield (XML_DECLARATION + '<root>' + xml_dict_content(head)).encode('utf-8')
+    yield '<{}{} type="dict">'.format(name, attributes).encode('utf-8')
+    for item_key, value in items:
+        yield xml_element(item_key, value).encode('utf-8')
+    yield '</{}></root>'.format(name).encode('utf-8')
+
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" ?>'
+XML_ESCAPE = str.maketrans({'&': '&amp;', '"': '&quot;', '\'': '&apos;', '<': '&lt;', '>': '&gt;'})
+XML_NAME_START_CHARS = 'A-Z_a-z\u00C0-\u00D6\u00D8-\u00F6\u00F8-\u02FF\u0370-\u037D\u037F-\u1FFF\u200C-\u200D' \
+                       '\u2070-\u218F\u2C00-\u2FEF\u3001-\uD7FF\uF900-\uFDCF\uFDF0-\uFFFD\U00010000-\U000EFFFF'
+XML_NAME_CHARS = XML_NAME_START_CHARS + '\\-.0-9\u00B7\u0300-\u036F\u203F-\u2040'
+
+
+def xml_escape(value):
+    return value.translate(XML_ESCAPE)
+
+
+def xml_element_name(key):
+    """
+    :return: tuple(element name, attributes string) for a dictionary key.
+             Invalid XML names are changed: numbers get a 'n' prefix, spaces are replaced by '_',
+             other keys are kept in the 'name' attribute of a <key> element
+    """
+    if type(key) is str:
+        return xml_valid_element_name(xml_escape(key))
+    return xml_valid_element_name(str(key))
+
+
+@lru_cache(maxsize=1)
+def xml_name_pattern():
+    """
+    :return: regexp of an element name without namespace prefix (only the predefined 'xml' prefix is bound),
+             compiled on first use (the unicode ranges are slow to compile)
+    """
+    return re.compile('(xml:)?[{}][{}]*'.format(XML_NAME_START_CHARS, XML_NAME_CHARS))
+
+
+@lru_cache(maxsize=4096)
+def xml_valid_element_name(key):
+    if xml_name_pattern().fullmatch(key):
+        return key, ''
+    if key.isdigit():
+        return 'n' + key, ''
+    try:
+        return 'n{}'.format(float(key)), ''
+    except ValueError:
+        pass
+    if xml_name_pattern().fullmatch(key.replace(' ', '_')):
+        return key.replace(' ', '_'), ''
+    return 'key', ' name="{}"'.format(key)
+
+
+def xml_type(value):
+    """
+    :return: value of the 'type' attribute for a value
+    """
+    if value is None:
+        return 'null'
+    value_type = type(value)
+    if value_type is bool:
+        return 'bool'
+    if value_type is str:
+        return 'str'
+    if value_type is int:
+        return 'int'
+    if value_type is float:
+        return 'float'
+    if isinstance(value, numbers.Number):
+        return 'number'
+    if isinstance(value, dict):
+        return 'dict'
+    if isinstance(value, Iterable):
+        return 'list'
+    return value_type.__name__
+
+
+def xml_text(value):
+    return xml_escape(value) if type(value) is str else str(value)
+
+
+def xml_dict_content(dictionary):
+    return ''.join(xml_element(key, value) for key, value in dictionary.items())
+
+
+def xml_list_content(items):
+    return ''.join(xml_item(item) for item in items)
+
+
+def xml_element(key, value):
+    """
+    :return: XML element of a dictionary (key, value)
+    """
+    name, attributes = xml_element_name(key)
+    if type(value) is bool:
+        text = 'true' if value else 'false'
+    elif isinstance(value, numbers.Number) or type(value) is str:
+        text = xml_text(value)
+    elif hasattr(value, 'isoformat'):
+        value = value.isoformat()
+        text = xml_escape(value)
+    elif isinstance(value, dict):
+        text = xml_dict_content(value)
+    elif isinstance(value, Iterable):
+        text = xml_list_content(value)
+    elif value is None:
+        text = ''
+    else:
+        raise TypeError('Unsupported data type: {} ({})'.format(value, type(value).__name__))
+    return '<{0}{1} type="{2}">{3}</{0}>'.format(name, attributes, xml_type(value), text)
+
+
+def xml_item(value):
+    """
+    :return: <item> XML element of a list item
+    """
+    if isinstance(value, numbers.Number) or type(value) is str:
+        # bool is a number here, its text is 'True' or 'False'
+        text = xml_text(value)
+    elif hasattr(value, 'isoformat'):
+        value = value.isoformat()
+        text = xml_escape(value)
+    elif isinstance(value, dict):
+        text = xml_dict_content(value)
+    elif isinstance(value, Iterable):
+        text = xml_list_content(value)
+    elif value is None:
+        text = ''
+    else:
+        raise TypeError('Unsupported data type: {} ({})'.format(value, type(value).__name__))
+    return '<item type="{}">{}</item>'.format(xml_type(value), text)
@@ -15,11 +15,15 @@ limitations under the License.
 """
 
 import argparse
+import contextlib
 import importlib
+import json
 import os
 import sys
 
 import edi
+import logarchive
+import profiler as _profiler
 import rules as _rules
 import version
 from edi import crosscheck_logs_filter
@@ -62,15 +66,37 @@ class ArgumentParser(object):
         group1.add_argument('-r', '--rules', type=str, help='INI file with contest rules')
         group2 = self.parser.add_mutually_exclusive_group(required=True)
         group2.add_argument('-slc', '--singlelogcheck', type=str, default=False, metavar='path_to_log', help='Check a single log')
-        group2.add_argument('-mlc', '--multilogcheck', type=str, default=False, metavar='path_to_folder', help='Check multiple logs')
-        group2.add_argument('-cc', '--crosscheck', type=str, default=False, metavar='path_to_folder', help='Cross-check multiple logs')
-        self.parser.add_argument('-cl', '--checklogs', type=str, default=None, metavar='path_to_folder', help='Checklogs used for cross-check')
+        group2.add_argument('-mlc', '--multilogcheck', type=str, default=False, metavar='path_to_folder', help='Check multiple logs (folder or .zip/.tar/.tar.gz archive)')
+        group2.add_argument('-cc', '--crosscheck', type=str, default=False, metavar='path_to_folder', help='Cross-check multiple logs (folder or .zip/.tar/.tar.gz archive)')
+        group2.add_argument('-d', '--daemon', type=str, default=False, metavar='address',
+                            help='Run a validation daemon on a Unix socket path or on a localhost port (port or localhost:port)')
+        self.parser.add_argument('-cl', '--checklogs', type=str, default=None, metavar='path_to_folder', help='Checklogs used for cross-check (folder or .zip/.tar/.tar.gz archive)')
         self.parser.add_argument('-o', '--output', type=self.check_output_value, required=False, default='human-friendly',
                                  help='Output format: human-friendly, json, xml, csv (default: human-friendly)')
+        self.parser.add_argument('--output-file', type=str, default=None, metavar='path_to_file',
+                                 help='Write the results to file instead of stdout')
         self.parser.add_argument('-v', '--verbose', action='store_true', help='More details for cross-check')
+        self.parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                                 help='Number of processes used to parse & validate the logs (default: 1)')
+        self.parser.add_argument('--header-only', action='store_true',
+                                 help='Validate only the logs header at multiple logs check (-mlc)')
+        self.parser.add_argument('--cache', type=str, default=None, metavar='path_to_folder',
+                                 help='Folder with cached parsed logs, only new or changed logs are parsed at cross-check')
+        self.parser.add_argument('--incremental', type=str, default=None, metavar='path_to_file',
+                                 help='File with the cross-check state, only the qsos affected by added, '
+                                      'changed or removed logs are cross-checked again')
+        self.parser.add_argument('--clear-cache', action='store_true', help='Invalidate the logs cache before cross-check')
+        self.parser.add_argument('--profile', action='store_true',
+                                 help='Print (to stderr) a JSON block with the time of every phase and '
+                                      'the number of logs, qsos, regex evaluations, qso comparisons & distances')
+        self.parser.add_argument('--profile-dump', type=str, default=None, metavar='path_to_file',
+                                 help='Profile the checks with cProfile and write the stats to file (see pstats)')
 
     def parse(self, args):
-        return self.parser.parse_args(args)
+        parsed = self.parser.parse_args(args)
+        if parsed.clear_cache and not parsed.cache:
+            self.parser.error('argument --clear-cache: requires --cache')
+        return parsed
 
 
 # TODO : This function is not used at this moment since I have support only for 'edi format'
@@ -103,11 +129,12 @@ def print_human_friendly_output(output, verbose=False):
         for log in output[edi.INFO_LOGS]:
             print_log_human_friendly(log)
             print('--------')
+            sys.stdout.flush()
     # cross check
     if output.get(edi.INFO_CC, False):
         print('Cross check logs from folder : {}'.format(output[edi.INFO_CC]))
         print('#########################')
-        for _call, _values in output[edi.INFO_OPERATORS].items():
+        for _call, _values in operators_items(output[edi.INFO_OPERATORS]):
             print('Callsign : {}'.format(_call))
             for _band, _details in _values['band'].items():
                 if _details.get('checklog', False) is True:
@@ -146,11 +173,50 @@ def print_log_human_friendly(output):
         print('No error found')
 
 
+def print_json_output(output):
+    # multi logs are streamed, a log result is printed as soon as it's available
+    if output.get(edi.INFO_MLC, False):
+        for chunk in edi.json_stream({edi.INFO_MLC: output[edi.INFO_MLC]}, edi.INFO_LOGS, output[edi.INFO_LOGS]):
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+        print()
+    # cross-check results are streamed, an operator is printed as soon as its output is made
+    elif output.get(edi.INFO_CC, False):
+        for chunk in edi.json_dict_stream({edi.INFO_CC: output[edi.INFO_CC]}, edi.INFO_OPERATORS,
+                                          operators_items(output[edi.INFO_OPERATORS])):
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+        print()
+    else:
+        print(edi.dict_to_json(output))
+
+
+def print_xml_output(output):
+    # multi logs are streamed, a log result is printed as soon as it's available
+    if output.get(edi.INFO_MLC, False):
+        # same format as print(bytes): b'...'
+        sys.stdout.write("b'")
+        for chunk in edi.xml_stream({edi.INFO_MLC: output[edi.INFO_MLC]}, edi.INFO_LOGS, output[edi.INFO_LOGS]):
+            sys.stdout.write(repr(chunk)[2:-1])
+            sys.stdout.flush()
+        print("'")
+    # cross-check results are streamed, an operator is printed as soon as its output is made
+    elif output.get(edi.INFO_CC, False):
+        sys.stdout.write("b'")
+        for chunk in edi.xml_dict_stream({edi.INFO_CC: output[edi.INFO_CC]}, edi.INFO_OPERATORS,
+                                         operators_items(output[edi.INFO_OPERATORS])):
+            sys.stdout.write(repr(chunk)[2:-1])
+            sys.stdout.flush()
+        print("'")
+    else:
+        print(edi.dict_to_xml(output))
+
+
 def print_csv_output(output):
     # cross check
     if output.get(edi.INFO_CC, False):
         print('Callsign, ValidLog, Band, Category, ConfirmedQso, Points')
-        for _call, _values in output[edi.INFO_OPERATORS].items():
+        for _call, _values in operators_items(output[edi.INFO_OPERATORS]):
             for _band, _details in _values['band'].items():
                 if not _details.get('checklog', False) is True:
                     print('{}, {}, {}, {}, {}, {}'.format(_call, _details['valid'], _band, _details['category'], _details['qsos_confirmed'], _details['points']))
@@ -160,8 +226,73 @@ def print_csv_output(output):
         print('NOT IMPLEMENTED')
 
 
+def operators_output(operator_instances, verbose=False):
+    """
+    Make the cross-check results one operator at a time, the results of all operators are not kept in memory
+    :param operator_instances: dictionary {key=callsign, value=Operator(callsign)} with cross-checked logs
+    :param verbose: add the errors & details of every qso
+    :return: generator with tuple(callsign, {'band': {band: {...}}})
+    """
+    for _call, _instance in operator_instances.items():
+        op_output = {}
+        op_output[edi.INFO_BANDS] = {}
+        for _log in _instance.logs:
+            op_output[edi.INFO_BANDS][_log.band] = {
+                'path': _log.path,
+                'points': _log.qsos_points,
+                'qsos_confirmed': _log.qsos_confirmed,
+                'valid': _log.valid_header,
+                'category': _log.category,
+                'checklog': _log.use_as_checklog,
+            }
+            if verbose is True:
+                _cc_errors = []
+                _cc_valid = []
+                for qso in _log.qsos:
+                    if qso.cc_confirmed is False:
+                        _cc_errors.append('{} : {}'.format(qso.qso_line, qso.cc_error))
+                    else:
+                        _cc_valid.append('{} : {} : {}'.format(qso.qso_line, qso.points, qso.cc_confirmed))
+                op_output[edi.INFO_BANDS][_log.band]['qso_errors'] = _cc_errors
+                op_output[edi.INFO_BANDS][_log.band]['qso_valid'] = _cc_valid
+
+        yield _call, op_output
+
+
+def operators_items(operators):
+    """
+    :param operators: cross-check results, dictionary {callsign: output} or operators_output() generator
+    :return: iterable with tuple(callsign, output)
+    """
+    return operators.items() if isinstance(operators, dict) else operators
+
+
+def open_output_file(path):
+    """
+    Open the results file before the checks are done, exit if it can't be written
+    :return: file object or None if path is not set
+    """
+    if not path:
+        return None
+    try:
+        return open(path, 'w')
+    except OSError as e:
+        print('Cannot open output file : {} ({})'.format(path, e.strerror))
+        sys.exit(1)
+
+
 def main():
     args = ArgumentParser().parse(sys.argv[1:])
+    output_file = open_output_file(args.output_file)
+    with output_file or contextlib.nullcontext():
+        run(args, output_file=output_file)
+
+
+def run(args, output_file=None):
+    """
+    Run the checks selected by the command line arguments
+    :param output_file: file object where the results are written (default: stdout)
+    """
     if args.output.upper() == 'HUMAN-FRIENDLY':
         print('{} - v{}'.format(version.__project__,  version.__version__))
 
@@ -169,9 +300,13 @@ def main():
     log = None
     logQso = None
 
+    profiler = _profiler.Profiler(enabled=args.profile, cprofile_path=args.profile_dump)
+    profiler.start()
+
     rules = None
     if args.rules:
-        rules = _rules.Rules(args.rules)
+        with profiler.phase('rules'):
+            rules = _rules.Rules(args.rules)
         log_format = rules.contest_log_format
     elif args.format:
         log_format = args.format
@@ -186,6 +321,17 @@ def main():
     log = lfmodule.Log
     logQso = lfmodule.LogQso
 
+    # validate the logs received on a socket, until the daemon is stopped
+    if args.daemon:
+        import logdaemon
+        try:
+            address = logdaemon.parse_address(args.daemon)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        logdaemon.LogDaemon(log, rules=rules, jobs=args.jobs).serve(address)
+        return
+
     output = {}
 
     # if 'validate one log'
@@ -196,74 +342,65 @@ def main():
             sys.exit(1)
         _log = log(args.singlelogcheck, rules=rules)
         output.update(_log.errors)
+        profiler.count('logs')
+        profiler.count('qsos', len(_log.qsos))
 
     # validate multiple logs
     elif args.multilogcheck:
         output[edi.INFO_MLC] = args.multilogcheck
-        if not os.path.isdir(args.multilogcheck):
+        if not logarchive.is_logs_folder(args.multilogcheck):
             print('Cannot open logs folder : {}'.format(args.multilogcheck))
             sys.exit(1)
-        logs_output = []
-        for filename in os.listdir(args.multilogcheck):
-            log_output = {}
-            _log = log(os.path.join(args.multilogcheck, filename), rules=rules)
-            log_output[edi.INFO_LOG] = filename
-            log_output.update(_log.errors)
-            logs_output.append(log_output)
-        output[edi.INFO_LOGS] = logs_output
+        logs_paths = []
+        for filename in logarchive.listdir(args.multilogcheck):
+            logs_paths.append((os.path.join(args.multilogcheck, filename), False))
         # add also checklogs
         if args.checklogs:
-            if os.path.isdir(args.checklogs):
-                logs_output = []
-                for filename in os.listdir(args.checklogs):
-                    log_output = {}
-                    _log = log(os.path.join(args.checklogs, filename), rules=rules, checklog=True)
-                    log_output[edi.INFO_LOG] = filename
-                    log_output.update(_log.errors)
-                    logs_output.append(log_output)
-                output[edi.INFO_LOGS].extend(logs_output)
+            if logarchive.is_logs_folder(args.checklogs):
+                for filename in logarchive.listdir(args.checklogs):
+                    logs_paths.append((os.path.join(args.checklogs, filename), True))
+        # logs are validated while the output is printed
+        output[edi.INFO_LOGS] = profiler.count_items(edi.check_logs(log, logs_paths, rules=rules, jobs=args.jobs,
+                                                                    header_only=args.header_only), 'logs')
 
     # crosscheck logs
     elif args.crosscheck:
         if not rules:
             print("No rules were provided")
             sys.exit(1)
+        cache = None
+        if args.cache:
+            import logcache
+            cache = logcache.LogCache(args.cache, rules=rules)
+            if args.clear_cache:
+                cache.clear()
         output[edi.INFO_CC] = args.crosscheck
-        output[edi.INFO_OPERATORS] = {}
-        op_instance = crosscheck_logs_filter(log, rules=rules, logs_folder=args.crosscheck, checklogs_folder=args.checklogs)
-        for _call, _instance in op_instance.items():
-            op_output = {}
-            op_output[edi.INFO_BANDS] = {}
-            for _log in _instance.logs:
-                op_output[edi.INFO_BANDS][_log.band] = {
-                    'path': _log.path,
-                    'points': _log.qsos_points,
-                    'qsos_confirmed': _log.qsos_confirmed,
-                    'valid': _log.valid_header,
-                    'category': _log.category,
-                    'checklog': _log.use_as_checklog,
-                }
-                if args.verbose is True:
-                    _cc_errors = []
-                    _cc_valid = []
-                    for qso in _log.qsos:
-                        if qso.cc_confirmed is False:
-                            _cc_errors.append('{} : {}'.format(qso.qso_line, qso.cc_error))
-                        else:
-                            _cc_valid.append('{} : {} : {}'.format(qso.qso_line, qso.points, qso.cc_confirmed))
-                    op_output[edi.INFO_BANDS][_log.band]['qso_errors'] = _cc_errors
-                    op_output[edi.INFO_BANDS][_log.band]['qso_valid'] = _cc_valid
-
-            output[edi.INFO_OPERATORS][_call] = op_output
-
-    if args.output.upper() == 'HUMAN-FRIENDLY':
-        print_human_friendly_output(output, verbose=args.verbose)
-    elif args.output.upper() == 'JSON':
-        print(edi.dict_to_json(output))
-    elif args.output.upper() == 'XML':
-        print(edi.dict_to_xml(output))
-    elif args.output.upper() == 'CSV':
-        print_csv_output(output)
+        if args.incremental:
+            crosscheck = edi.IncrementalCrosscheck.load(args.incremental, log, rules, cache=cache, jobs=args.jobs)
+            op_instance = crosscheck.update(args.crosscheck, args.checklogs)
+            crosscheck.save(args.incremental)
+        else:
+            op_instance = crosscheck_logs_filter(log, rules=rules, logs_folder=args.crosscheck,
+                                                 checklogs_folder=args.checklogs, cache=cache, jobs=args.jobs)
+        # the operators output is made while it's printed
+        output[edi.INFO_OPERATORS] = operators_output(op_instance, verbose=args.verbose)
+        if cache is not None:
+            profiler.count('cache_hits', cache.hits)
+            profiler.count('cache_misses', cache.misses)
+
+    with profiler.phase('output'), contextlib.redirect_stdout(output_file or sys.stdout):
+        if args.output.upper() == 'HUMAN-FRIENDLY':
+            print_human_friendly_output(output, verbose=args.verbose)
+        elif args.output.upper() == 'JSON':
+            print_json_output(output)
+        elif args.output.upper() == 'XML':
+            print_xml_output(output)
+        elif args.output.upper() == 'CSV':
+            print_csv_output(output)
+
+    profiler.stop()
+    if args.profile:
+        sys.stderr.write(json.dumps({'profile': profiler.report()}) + '\n')
 
 if __name__ == '__main__':
     main()
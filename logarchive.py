@@ -0,0 +1,193 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import io
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# zipfile & tarfile are imported only by open_archive(), a check of regular files doesn't load them
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz')
+
+# archive opened by open_archive(), is_zip tells the type of handle (ZipFile or TarFile)
+# and key is the archive file (inode, size, mtime) when it was opened
+Archive = namedtuple('Archive', ['handle', 'is_zip', 'key'])
+
+# archives opened by this process: {path: Archive}
+_archives = {}
+_archives_pid = None
+
+
+def is_archive(path):
+    """
+    :return: True if path is a zip/tar file
+    """
+    return path.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+def is_logs_folder(path):
+    """
+    :return: True if path is a folder or an archive with logs
+    """
+    return os.path.isdir(path) or is_archive(path)
+
+
+def listdir(path):
+    """
+    List a folder or the files from an archive.
+    The logs from an archive are read with path = os.path.join(archive path, name)
+    """
+    if not is_archive(path):
+        return os.listdir(path)
+    archive = open_archive(path)
+    if archive.is_zip:
+        return [info.filename for info in archive.handle.infolist() if not info.is_dir()]
+    return [info.name for info in archive.handle.getmembers() if info.isfile()]
+
+
+def split_path(path):
+    """
+    :return: tuple(archive path, member name) for a file from an archive
+             or tuple(None, path) for a regular file
+    """
+    lower_path = path.lower()
+    if not any(extension in lower_path for extension in ARCHIVE_EXTENSIONS):
+        return None, path
+    for nr, char in enumerate(path):
+        if char not in ('/', os.sep) or not lower_path[:nr].endswith(ARCHIVE_EXTENSIONS):
+            continue
+        if os.path.isfile(path[:nr]):
+            return path[:nr], path[nr+1:].replace(os.sep, '/')
+    return None, path
+
+
+def archive_key(path):
+    _stat = os.stat(path)
+    return _stat.st_ino, _stat.st_size, _stat.st_mtime_ns
+
+
+def open_archive(path):
+    """
+    Open an archive, the archives are kept open and reused by the current process
+    until close_archives() or until the archive file is replaced or changed
+    :return: Archive instance
+    """
+    global _archives_pid
+    if _archives_pid != os.getpid():
+        # archives opened by a parent process can't be shared (same file offset)
+        _archives.clear()
+        _archives_pid = os.getpid()
+    key = archive_key(path)
+    archive = _archives.get(path)
+    if archive is not None and archive.key != key:
+        archive.handle.close()
+        archive = None
+    if archive is None:
+        import tarfile
+        import zipfile
+        if zipfile.is_zipfile(path):
+            archive = Archive(zipfile.ZipFile(path), True, key)
+        else:
+            archive = Archive(tarfile.open(path), False, key)
+        _archives[path] = archive
+    return archive
+
+
+def close_archives():
+    for archive in _archives.values():
+        archive.handle.close()
+    _archives.clear()
+
+
+@contextmanager
+def closing_archives():
+    """
+    Close the archives opened by this process when the 'with' block ends,
+    the archives are not kept open between the checks of a long running process
+    """
+    try:
+        yield
+    finally:
+        close_archives()
+
+
+def archive_member(path):
+    """
+    :return: tuple(Archive, ZipInfo or TarInfo) for a file from an archive or None for a regular file
+    """
+    archive_path, name = split_path(path)
+    if archive_path is None:
+        return None
+    archive = open_archive(archive_path)
+    try:
+        if archive.is_zip:
+            return archive, archive.handle.getinfo(name)
+        return archive, archive.handle.getmember(name)
+    except KeyError:
+        raise FileNotFoundError('No such file in archive: {}'.format(path))
+
+
+def open_binary(path):
+    """
+    Open a regular file or a file from an archive for reading bytes, the archive is not extracted
+    """
+    member = archive_member(path)
+    if member is None:
+        return open(path, 'rb')
+    archive, info = member
+    if archive.is_zip:
+        return archive.handle.open(info)
+    _file = archive.handle.extractfile(info)
+    if _file is None:
+        raise IsADirectoryError('Not a file: {}'.format(path))
+    return _file
+
+
+def open_text(path):
+    """
+    Same as open(path, 'r') but path can be also a file from an archive
+    """
+    if split_path(path)[0] is None:
+        return open(path, 'r')
+    return io.TextIOWrapper(open_binary(path))
+
+
+def getmtime(path):
+    """
+    Same as os.path.getmtime() but path can be also a file from an archive (the archive entry time is used)
+    """
+    member = archive_member(path)
+    if member is None:
+        return os.path.getmtime(path)
+    archive, info = member
+    if archive.is_zip:
+        return time.mktime(info.date_time + (0, 0, -1))
+    return info.mtime
+
+
+def stat(path):
+    """
+    :return: tuple(size, mtime in nanoseconds) of a regular file or of a file from an archive
+    """
+    member = archive_member(path)
+    if member is None:
+        _stat = os.stat(path)
+        return _stat.st_size, _stat.st_mtime_ns
+    archive, info = member
+    size = info.file_size if archive.is_zip else info.size
+    return size, int(getmtime(path) * 10**9)
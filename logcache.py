@@ -0,0 +1,114 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import os
+import pickle
+
+import logarchive
+
+CACHE_EXTENSION = '.logcache'
+CACHE_VERSION = 4  # increase it when the layout of the pickled logs is changed
+
+
+class LogCache(object):
+    """
+    Keep parsed & validated logs on disk, one pickle file per log.
+
+    A cached log is used only if the log file and the rules are unchanged:
+    cache version, path, size, mtime, content hash, rules hash, log class and checklog flag
+    must be the same as when the log was stored.
+    Changed or new logs are parsed and the cache entry is rewritten.
+    """
+    folder = None
+    rules_hash = None
+    hits = 0
+    misses = 0
+
+    def __init__(self, folder, rules=None):
+        self.folder = folder
+        self.rules_hash = rules.fingerprint() if rules else None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.folder, exist_ok=True)
+
+    def entry_path(self, path, checklog=False):
+        """
+        :return: path of the cache file for a log
+        """
+        key = '{}|{}'.format(os.path.abspath(path), checklog)
+        return os.path.join(self.folder, hashlib.sha1(key.encode()).hexdigest() + CACHE_EXTENSION)
+
+    def fingerprint(self, log_class, path, checklog=False):
+        """
+        :return: tuple identifying the log file content & the rules, or None if file cannot be read
+        """
+        try:
+            size, mtime_ns = logarchive.stat(path)
+            with logarchive.open_binary(path) as _file:
+                content_hash = hashlib.sha256(_file.read()).hexdigest()
+        except Exception:
+            return None
+        return (CACHE_VERSION, os.path.abspath(path), size, mtime_ns, content_hash, self.rules_hash,
+                log_class.__module__ + '.' + log_class.__name__, checklog)
+
+    def get(self, entry_path, fingerprint):
+        """
+        :return: the cached log or None if is missing, outdated or unreadable
+        """
+        try:
+            with open(entry_path, 'rb') as _file:
+                entry = pickle.load(_file)
+        except Exception:
+            return None
+        if entry.get('fingerprint') != fingerprint:
+            return None
+        return entry.get('log')
+
+    def store(self, entry_path, fingerprint, log):
+        tmp_path = entry_path + '.tmp'
+        with open(tmp_path, 'wb') as _file:
+            pickle.dump({'fingerprint': fingerprint, 'log': log}, _file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry_path)
+
+    def load_log(self, log_class, path, rules=None, checklog=False):
+        """
+        Return a log instance from cache or parse the log and store it in cache
+        """
+        fingerprint = self.fingerprint(log_class, path, checklog)
+        if fingerprint is None:
+            # let the log class report the I/O error
+            return log_class(path, rules=rules, checklog=checklog)
+
+        entry_path = self.entry_path(path, checklog)
+        log = self.get(entry_path, fingerprint)
+        if log is not None:
+            self.hits += 1
+            log.set_rules(rules)
+            return log
+
+        self.misses += 1
+        log = log_class(path, rules=rules, checklog=checklog)
+        self.store(entry_path, fingerprint, log)
+        return log
+
+    def clear(self):
+        """
+        Remove all cached logs
+        """
+        for filename in os.listdir(self.folder):
+            if filename.endswith(CACHE_EXTENSION):
+                os.remove(os.path.join(self.folder, filename))
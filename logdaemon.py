@@ -0,0 +1,367 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import base64
+import binascii
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+import time
+from collections import deque
+
+import edi
+import logarchive
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+DEFAULT_HOST = 'localhost'
+DEFAULT_LOG_NAME = 'log.edi'  # log name used for content requests without 'name'
+MAX_REQUEST_SIZE = 16 * 1024 * 1024  # bytes of a request line
+REQUEST_QUEUE_SIZE = 128  # connections waiting to be accepted
+LATENCY_SAMPLES = 1000  # latency percentiles are computed from the last requests
+LATENCY_PERCENTILES = (50, 95, 99)
+COMMANDS = ('stats',)
+
+
+def parse_address(arg):
+    """
+    :param arg: 'port', 'host:port' (host must be local) or path to an Unix socket
+    :return: tuple(host, port) for a TCP socket or path to an Unix socket
+    :raise: ValueError
+    """
+    if arg.isdigit():
+        return DEFAULT_HOST, int(arg)
+    host, separator, port = arg.rpartition(':')
+    if separator and port.isdigit() and '/' not in arg:
+        host = host.strip('[]')
+        if host not in LOCAL_HOSTS:
+            raise ValueError('The daemon can listen only on a local address : {}'.format(', '.join(LOCAL_HOSTS)))
+        return host, int(port)
+    if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+        raise ValueError('Unix sockets are not supported on this platform, use a localhost port')
+    return arg
+
+
+def format_address(address):
+    if isinstance(address, str):
+        return address
+    return '{}:{}'.format(*address[:2])
+
+
+def init_daemon_worker(log_class, rules):
+    # the daemon is stopped by Ctrl-C, the workers are stopped by the daemon
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    edi.init_logs_worker(log_class, rules, None)
+
+
+def check_log_worker(log_request):
+    """
+    Validate a log in a worker process initialized by init_daemon_worker()
+    :param log_request: tuple(path, checklog, header_only, lines)
+    """
+    path, checklog, header_only, lines = log_request
+    with logarchive.closing_archives():
+        return edi.check_log(edi._logs_worker['log_class'], path, rules=edi._logs_worker['rules'],
+                             checklog=checklog, header_only=header_only, lines=lines)
+
+
+class DaemonStats(object):
+    """
+    Throughput & latency counters of the validation requests, updated by the handler threads
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.requests = 0
+        self.failed_requests = 0  # requests who were not valid (the logs with errors are not counted)
+        self.active_requests = 0
+        self.max_active_requests = 0
+        self.total_latency = 0.0
+        self.min_latency = None
+        self.max_latency = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def begin(self):
+        with self.lock:
+            self.active_requests += 1
+            self.max_active_requests = max(self.max_active_requests, self.active_requests)
+
+    def end(self, latency, failed=False):
+        """
+        :param latency: request time in seconds
+        """
+        with self.lock:
+            self.active_requests -= 1
+            self.requests += 1
+            self.failed_requests += 1 if failed else 0
+            self.total_latency += latency
+            self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+            self.max_latency = latency if self.max_latency is None else max(self.max_latency, latency)
+            self.latencies.append(latency)
+
+    def report(self):
+        """
+        :return: dictionary with the counters, the latencies are in milliseconds
+        """
+        with self.lock:
+            uptime = time.monotonic() - self.start_time
+            latencies = sorted(self.latencies)
+            report = {'requests': self.requests,
+                      'failed_requests': self.failed_requests,
+                      'active_requests': self.active_requests,
+                      'max_active_requests': self.max_active_requests,
+                      'uptime_seconds': uptime,
+                      'requests_per_second': self.requests / uptime if uptime else 0.0,
+                      'latency_ms': None}
+            if latencies:
+                report['latency_ms'] = {'mean': self.total_latency / self.requests * 1000,
+                                        'min': self.min_latency * 1000,
+                                        'max': self.max_latency * 1000}
+                for percentile in LATENCY_PERCENTILES:
+                    index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+                    report['latency_ms']['p{}'.format(percentile)] = latencies[index] * 1000
+        return report
+
+
+class LogDaemon(object):
+    """
+    Long running log validator, the rules are loaded once and the logs are validated on requests
+    received on an Unix socket or on a localhost TCP port.
+
+    The protocol is JSON lines, every request is a JSON object on one line and gets one JSON line as response.
+    Requests:
+        {"path": "path/to/log.edi"}
+        {"content": "log text", "name": "log.edi"}
+        {"content_base64": "base64 of the log bytes", "name": "log.edi"}
+        {"command": "stats"}
+    The validation requests accept also "checklog" & "header_only" flags and an "id" who is returned in response.
+    A validation response has the same structure as -slc output: {"log": name, "io": [], "header": [], "qso": []},
+    an invalid request gets {"error": "message"}.
+    With jobs > 1 the logs are validated by a pool of worker processes, else by the connection threads.
+    """
+
+    def __init__(self, log_class, rules=None, jobs=1):
+        self.log_class = log_class
+        self.rules = rules
+        self.jobs = jobs
+        self.stats = DaemonStats()
+        self.executor = None
+        # the archive handles of logarchive are shared by the threads, an archive is read by one request
+        # at a time and is closed after it (an uploaded archive can be replaced between requests)
+        self.archive_lock = threading.Lock()
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_daemon_worker,
+                                                initargs=(log_class, rules))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    @staticmethod
+    def content_lines(request):
+        """
+        :return: the log lines from the request content, read like a log file
+        :raise: ValueError if the content is not valid, UnicodeDecodeError if the log can't be decoded
+        """
+        if 'content' in request:
+            if not isinstance(request['content'], str):
+                raise ValueError("'content' must be a string")
+            return io.StringIO(request['content'], newline=None).readlines()
+        try:
+            data = base64.b64decode(request['content_base64'], validate=True)
+        except (binascii.Error, TypeError) as e:
+            raise ValueError("'content_base64' is not valid base64 : {}".format(e))
+        return io.TextIOWrapper(io.BytesIO(data)).readlines()
+
+    def validate(self, request):
+        """
+        Validate the log from a request
+        :return: dictionary with log name and log errors
+        :raise: ValueError if the request is not valid
+        """
+        checklog = bool(request.get('checklog', False))
+        header_only = bool(request.get('header_only', False))
+        if 'path' in request:
+            path, lines = request['path'], None
+            if not isinstance(path, str):
+                raise ValueError("'path' must be a string")
+        elif 'content' in request or 'content_base64' in request:
+            path = request.get('name') or DEFAULT_LOG_NAME
+            if not isinstance(path, str):
+                raise ValueError("'name' must be a string")
+            try:
+                lines = self.content_lines(request)
+            except UnicodeDecodeError as e:
+                return {edi.INFO_LOG: path,
+                        edi.ERR_IO: [(None, 'Cannot read edi log. Error: {}'.format(e))],
+                        edi.ERR_HEADER: [],
+                        edi.ERR_QSO: []}
+        else:
+            raise ValueError("Request must have 'path', 'content' or 'content_base64'")
+
+        if self.executor is not None:
+            log_output = self.executor.submit(check_log_worker, (path, checklog, header_only, lines)).result()
+        elif lines is None and logarchive.split_path(path)[0] is not None:
+            with self.archive_lock, logarchive.closing_archives():
+                log_output = edi.check_log(self.log_class, path, rules=self.rules, checklog=checklog,
+                                           header_only=header_only)
+        else:
+            log_output = edi.check_log(self.log_class, path, rules=self.rules, checklog=checklog,
+                                       header_only=header_only, lines=lines)
+        # same log name as -slc output
+        log_output[edi.INFO_LOG] = path
+        return log_output
+
+    @staticmethod
+    def parse_request(line):
+        """
+        :param line: request as JSON (bytes or str)
+        :return: request dictionary
+        :raise: ValueError if the request is not valid
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            raise ValueError('Request is not valid JSON : {}'.format(e))
+        if not isinstance(request, dict):
+            raise ValueError('Request must be a JSON object')
+        if 'command' in request and request['command'] not in COMMANDS:
+            raise ValueError('Unknown command : {}'.format(request['command']))
+        return request
+
+    def process(self, line):
+        """
+        :param line: request as JSON (bytes or str)
+        :return: response dictionary
+        """
+        start = time.perf_counter()
+        try:
+            request = self.parse_request(line)
+        except ValueError as e:
+            self.stats.begin()
+            self.stats.end(time.perf_counter() - start, failed=True)
+            return {'error': str(e)}
+        if request.get('command') == 'stats':
+            return self.stats.report()
+
+        self.stats.begin()
+        failed = True
+        try:
+            response = self.validate(request)
+            failed = False
+        except ValueError as e:
+            response = {'error': str(e)}
+        finally:
+            self.stats.end(time.perf_counter() - start, failed=failed)
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def server(self, address):
+        """
+        :param address: tuple(host, port) or path to an Unix socket, see parse_address()
+        :return: socketserver instance, not started
+        """
+        if isinstance(address, str):
+            if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+                # socket left by a daemon who was killed
+                os.remove(address)
+            server = UnixServer(address, RequestHandler)
+        else:
+            server_class = TCPServer6 if ':' in address[0] else TCPServer
+            server = server_class(address, RequestHandler)
+        server.log_daemon = self
+        return server
+
+    def serve(self, address):
+        """
+        Serve the requests until the process is interrupted
+        """
+        server = self.server(address)
+        print('Validation daemon is listening on {}'.format(format_address(server.server_address)), flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.close()
+            if isinstance(address, str) and os.path.exists(address):
+                os.remove(address)
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Read the JSON line requests of a connection and write the responses
+    """
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_SIZE + 1)
+            if not line:
+                break
+            if len(line) > MAX_REQUEST_SIZE:
+                self.send({'error': 'Request is bigger than {} bytes'.format(MAX_REQUEST_SIZE)})
+                break
+            if not line.strip():
+                continue
+            self.send(self.server.log_daemon.process(line))
+
+    def send(self, response):
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+class TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+class TCPServer6(TCPServer):
+    address_family = socket.AF_INET6
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+        request_queue_size = REQUEST_QUEUE_SIZE
+
+
+def request(address, message, timeout=None):
+    """
+    Send a request to a running daemon
+    :param address: tuple(host, port) or path to an Unix socket, see parse_address()
+    :param message: request dictionary
+    :return: response dictionary
+    """
+    if isinstance(address, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        connection.connect(address)
+    else:
+        connection = socket.create_connection(address, timeout=timeout)
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps(message).encode('utf-8') + b'\n')
+        stream.flush()
+        return json.loads(stream.readline())
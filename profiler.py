@@ -0,0 +1,223 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import functools
+import time
+from contextlib import contextmanager
+
+import edi
+
+COUNTERS = ('logs', 'qsos', 'regex_evaluations', 'qso_comparisons', 'distance_computations')
+
+
+class Profiler(object):
+    """
+    Wall & CPU time of the run phases and counters of the work done, used by --profile.
+
+    The edi functions are wrapped by start() and restored by stop(), without profiling
+    the checker runs the original functions. The time of a phase doesn't include the time
+    of the phases called from it (ex: 'header' doesn't include 'file_io').
+    The logs & qsos are counted from the loaded logs (including the logs from cache or from worker processes),
+    a multiple logs check counts only the logs.
+    The regular expressions are counted by the wrappers of edi.regex_match() & of the qso checks (from the
+    sizes of their pattern tables), with jobs > 1 the logs are parsed by worker processes, that work is
+    measured in the 'load' phase and its regular expressions are not counted.
+    """
+    enabled = False
+    cprofile_path = None
+
+    def __init__(self, enabled=True, cprofile_path=None):
+        """
+        :param cprofile_path: if set, the run between start() & stop() is profiled by cProfile and
+                              the stats are written to this file (see pstats module)
+        """
+        self.enabled = enabled or cprofile_path is not None
+        self.cprofile_path = cprofile_path
+        self.phases = {}  # {name: {'wall_seconds': float, 'cpu_seconds': float, 'calls': int}}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.nested = []  # [wall, cpu] time of the nested phases, for every running phase
+        self.originals = []  # (owner, name, original attribute) replaced by start()
+        self.cprofile = None
+        self.start_time = None
+        self.total = None
+        self.distance_misses = 0
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measure the code run inside 'with' as phase name
+        """
+        if not self.enabled:
+            yield
+            return
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        self.nested.append([0.0, 0.0])
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+            nested_wall, nested_cpu = self.nested.pop()
+            stats = self.phases.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})
+            stats['wall_seconds'] += wall - nested_wall
+            stats['cpu_seconds'] += cpu - nested_cpu
+            stats['calls'] += 1
+            if self.nested:
+                self.nested[-1][0] += wall
+                self.nested[-1][1] += cpu
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_items(self, items, counter):
+        """
+        :return: iterable with the items, counted as they are consumed
+        """
+        if not self.enabled:
+            return items
+        return self._count_items(items, counter)
+
+    def _count_items(self, items, counter):
+        for item in items:
+            self.counters[counter] += 1
+            yield item
+
+    def wrap(self, owner, name, phase=None, counters=None):
+        """
+        Replace owner.name with a function who measures the calls as phase and increments the counters
+        :param counters: dictionary {counter: function(args, result) who returns the counter increment or None for 1}
+        """
+        original = owner.__dict__[name]
+        function = getattr(owner, name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if phase:
+                with self.phase(phase):
+                    result = function(*args, **kwargs)
+            else:
+                result = function(*args, **kwargs)
+            for counter, count in (counters or {}).items():
+                self.counters[counter] += count(args, result) if count else 1
+            return result
+
+        self.originals.append((owner, name, original))
+        # a classmethod is wrapped already bound to owner
+        setattr(owner, name, staticmethod(wrapper) if isinstance(original, (staticmethod, classmethod)) else wrapper)
+
+    def start(self):
+        """
+        Wrap the edi functions and start cProfile (if a stats file was provided)
+        """
+        if not self.enabled:
+            return
+        self.wrap(edi, 'load_logs', phase='load', counters={'logs': self.loaded_logs, 'qsos': self.loaded_qsos})
+        self.wrap(edi.Log, 'read_file_content', phase='file_io')
+        self.wrap(edi.Log, 'read_header_content', phase='file_io')
+        self.wrap(edi.Log, 'validate_header', phase='header')
+        self.wrap(edi.Log, 'load_qsos', phase='qsos')
+        self.wrap(edi, 'operators_from_logs', phase='operators')
+        self.wrap(edi, 'mark_older_logs', phase='mark_older_logs')
+        self.wrap(edi, 'crosscheck_logs', phase='crosscheck')
+        self.wrap(edi, 'score_logs', phase='score')
+        self.wrap(edi, 'match_qso', counters={'qso_comparisons': None})
+        self.wrap(edi, 'batch_qth_distance', counters={'distance_computations': self.batch_distances})
+        self.wrap(edi, 'regex_match', counters={'regex_evaluations': None})
+        self.wrap(edi.LogQso, 'qso_fields_validator', counters={'regex_evaluations': self.qso_field_checks})
+        self.wrap(edi.LogQso, 'generic_qso_validator', counters={'regex_evaluations': self.generic_qso_checks})
+        self.wrap(edi.LogQso, 'rules_based_qso_validator', counters={'regex_evaluations': self.rules_qso_checks})
+
+        self.distance_misses = edi.locators_distance.cache_info().misses
+        self.start_time = time.perf_counter(), time.process_time()
+        if self.cprofile_path:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stop(self):
+        """
+        Restore the edi functions and write the cProfile stats
+        """
+        if not self.enabled or self.start_time is None:
+            return
+        if self.cprofile:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+            self.cprofile = None
+        self.total = {'wall_seconds': time.perf_counter() - self.start_time[0],
+                      'cpu_seconds': time.process_time() - self.start_time[1]}
+        self.start_time = None
+        # qth_distance() computes only the distances who are not cached (the misses are reset by a cache clear)
+        misses = edi.locators_distance.cache_info().misses
+        self.counters['distance_computations'] += misses - self.distance_misses if misses >= self.distance_misses \
+            else misses
+        while self.originals:
+            owner, name, original = self.originals.pop()
+            setattr(owner, name, original)
+
+    @staticmethod
+    def loaded_logs(args, result):
+        """
+        :return: number of logs loaded by a load_logs() call
+        """
+        return len(result)
+
+    @staticmethod
+    def loaded_qsos(args, result):
+        """
+        :return: number of qsos of the logs loaded by a load_logs() call
+        """
+        return sum(len(log.qsos) for log in result)
+
+    @staticmethod
+    def qso_field_checks(args, result):
+        """
+        :return: number of field patterns of a qso_fields_validator() call, a line with all the fields is counted
+                 with all the patterns (the checks of an invalid line are counted by the regex_match() wrapper)
+        """
+        return 0 if args[1] is None else len(edi.LogQso.QSO_FIELD_PATTERNS)
+
+    @staticmethod
+    def generic_qso_checks(args, result):
+        """
+        :return: number of patterns of a generic_qso_validator() call (the qth locator is counted by regex_match())
+        """
+        return len(edi.LogQso.GENERIC_QSO_CHECKS)
+
+    @staticmethod
+    def rules_qso_checks(args, result):
+        """
+        :return: number of patterns of a rules_based_qso_validator() call
+        """
+        qso = args[0]
+        return 1 if qso.rules is not None and edi.contest_rules(qso.rules).qso_call_pattern else 0
+
+    @staticmethod
+    def batch_distances(args, result):
+        """
+        :return: number of distances computed by NumPy in a batch_qth_distance() call
+        """
+        if len(args[0]) < edi.BATCH_DISTANCE_MIN_PAIRS or not edi.numpy:
+            return 0
+        return len(args[0])
+
+    def report(self):
+        """
+        :return: dictionary with the phases time, total time, counters & the distance caches info
+        """
+        return {'phases': self.phases,
+                'total': self.total,
+                'counters': self.counters,
+                'distance_cache': edi.distance_cache_info()}
@@ -15,10 +15,77 @@ limitations under the License.
 """
 
 import configparser
+import hashlib
+import json
 import os
+import re
 import sys
+from bisect import bisect_right
+from collections import namedtuple
 from datetime import datetime
 
+Band = namedtuple('Band', ['nr', 'name', 'regexp', 'pattern', 'log_pattern', 'multiplier'])
+Period = namedtuple('Period', ['nr', 'begindate', 'enddate', 'beginhour', 'endhour', 'bands', 'begin', 'end'])
+Category = namedtuple('Category', ['nr', 'name', 'regexp', 'pattern', 'bands'])
+
+DEFAULT_QSO_TIME_TOLERANCE = 5  # minutes
+
+
+def epoch_minute(moment):
+    """
+    :param moment: datetime
+    :return: number of minutes since 0001-01-01 00:00 (an integer timestamp for date+hour comparisons)
+    """
+    return moment.toordinal() * 1440 + moment.hour * 60 + moment.minute
+
+
+class ContestRules(namedtuple('ContestRules', ['begin_date', 'end_date', 'begin_hour', 'end_hour',
+                                               'bands', 'periods', 'categories', 'modes', 'modes_set',
+                                               'extra_fields', 'callregexp', 'call_pattern', 'qso_call_pattern',
+                                               'log_format', 'period_starts', 'period_numbers',
+                                               'qso_time_tolerance'])):
+    """
+    Immutable snapshot of validated contest rules, see Rules.compile()
+        bands, periods, categories : tuples with Band, Period, Category (ordered by number)
+        Band.pattern : band regexp used to validate 'PBand=' (\\s*(regexp)\\s*)
+        Band.log_pattern : band regexp used to select the logs for a band (case insensitive)
+        Period.begin, Period.end : period boundaries as epoch minutes (see epoch_minute())
+        Category.pattern : category regexp used to validate 'PSect=' (case insensitive)
+        modes : tuple with int modes in rules order, modes_set : frozenset with the same modes
+        call_pattern, qso_call_pattern : 'callregexp' used for log header & qso callsigns (or None)
+        period_starts, period_numbers : sorted interval table used by period_nr()
+        qso_time_tolerance : max difference (in minutes) between the times of 2 matching qsos
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def period_table(periods):
+        """
+        Split the time covered by periods in consecutive intervals, each interval
+        has the number of the first period that contains it (or None)
+        :param periods: list of Period
+        :return: (interval starts, period numbers)
+        """
+        bounds = set()
+        for period in periods:
+            if period.begin <= period.end:
+                bounds.update((period.begin, period.end + 1))
+        bounds = sorted(bounds)
+        numbers = []
+        for start in bounds:
+            numbers.append(next((period.nr for period in periods if period.begin <= start <= period.end), None))
+        return tuple(bounds), tuple(numbers)
+
+    def period_nr(self, minute):
+        """
+        :param minute: qso date+hour as epoch minute
+        :return: number of the period who contains the minute or None
+        """
+        index = bisect_right(self.period_starts, minute) - 1
+        if index < 0:
+            return None
+        return self.period_numbers[index]
+
 
 class Rules(object):
     """
@@ -37,6 +104,7 @@ class Rules(object):
         periods=2
         categories=3
         modes=1,2,6
+        qsotimetolerance=5  (optional: max minutes between the times of 2 matching qsos, default 5)
         # 0 non of below non of below
         # 1 SSB SSB
         # 2 CW CW
@@ -102,6 +170,7 @@ class Rules(object):
     path = None
     config = None
     valid = False
+    snapshot = None  # ContestRules instance
 
     def __init__(self, path):
         if not os.path.isfile(path):
@@ -111,6 +180,7 @@ class Rules(object):
         self.config = configparser.ConfigParser()
         self.config.read_string(self.read_config_file_content(self.path))
         self.validate_rules()
+        self.snapshot = self.compile()
 
     @staticmethod
     def read_config_file_content(path):
@@ -231,6 +301,16 @@ class Rules(object):
         except ValueError:
             raise ValueError('The rules have invalid \'modes\' value in [contest] section')
 
+    @property
+    def contest_qso_time_tolerance(self):
+        """
+        :return: max difference (in minutes) between the times of 2 matching qsos, optional field (default 5)
+        """
+        tolerance = self.config['contest'].get('qsotimetolerance', str(DEFAULT_QSO_TIME_TOLERANCE))
+        if not tolerance.isdigit():
+            raise ValueError('The rules have invalid \'qsotimetolerance\' value in [contest] section')
+        return int(tolerance)
+
     @property
     def contest_bands_nr(self):
         """
@@ -335,3 +415,89 @@ class Rules(object):
         if field in self.contest_extra_fields:
             return self.config['extra'][field]
         return None
+
+    def compile(self):
+        """
+        Build an immutable snapshot of the rules with typed values and compiled regular expressions.
+        The snapshot is used in the hot paths of log validation and cross-check.
+        :return: ContestRules instance
+        :raise: ValueError if a regexp from rules is invalid
+        """
+        bands = []
+        for band in range(1, self.contest_bands_nr+1):
+            _band = self.contest_band(band)
+            try:
+                bands.append(Band(nr=band,
+                                  name=_band['band'],
+                                  regexp=_band['regexp'],
+                                  pattern=re.compile(r'\s*(' + _band['regexp'] + r')\s*'),
+                                  log_pattern=re.compile(_band['regexp'], re.IGNORECASE),
+                                  multiplier=int(_band['multiplier'])))
+            except re.error:
+                raise ValueError('Rules file has invalid regexp for band {}'.format(band))
+            except ValueError:
+                raise ValueError('Rules file has invalid multiplier for band {}'.format(band))
+
+        periods = []
+        for period in range(1, self.contest_periods_nr+1):
+            _period = self.contest_period(period)
+            periods.append(Period(nr=period,
+                                  begindate=_period['begindate'],
+                                  enddate=_period['enddate'],
+                                  beginhour=_period['beginhour'],
+                                  endhour=_period['endhour'],
+                                  bands=tuple(self.contest_period_bands(period)),
+                                  begin=epoch_minute(datetime.strptime(_period['begindate'] + _period['beginhour'],
+                                                                       '%Y%m%d%H%M')),
+                                  end=epoch_minute(datetime.strptime(_period['enddate'] + _period['endhour'],
+                                                                     '%Y%m%d%H%M'))))
+
+        categories = []
+        for category in range(1, self.contest_categories_nr+1):
+            _category = self.contest_category(category)
+            try:
+                pattern = re.compile(r'\s*(' + _category['regexp'] + r')\s*', re.IGNORECASE)
+            except re.error:
+                raise ValueError('Rules file has invalid regexp for category {}'.format(category))
+            categories.append(Category(nr=category,
+                                       name=_category['name'],
+                                       regexp=_category['regexp'],
+                                       pattern=pattern,
+                                       bands=tuple(self.contest_category_bands(category))))
+
+        callregexp = self.contest_extra_field_value('callregexp')
+        call_pattern = None
+        qso_call_pattern = None
+        if callregexp:
+            try:
+                call_pattern = re.compile('^\\s*(' + callregexp + ').*', re.IGNORECASE)
+                qso_call_pattern = re.compile('^\\s*' + callregexp, re.IGNORECASE)
+            except re.error:
+                raise ValueError('Rules file has invalid \'callregexp\' value in [extra] section')
+
+        modes = tuple(self.contest_qso_modes)
+        period_starts, period_numbers = ContestRules.period_table(periods)
+        return ContestRules(begin_date=self.contest_begin_date,
+                            end_date=self.contest_end_date,
+                            begin_hour=self.contest_begin_hour,
+                            end_hour=self.contest_end_hour,
+                            bands=tuple(bands),
+                            periods=tuple(periods),
+                            categories=tuple(categories),
+                            modes=modes,
+                            modes_set=frozenset(modes),
+                            extra_fields=tuple(self.contest_extra_fields),
+                            callregexp=callregexp,
+                            call_pattern=call_pattern,
+                            qso_call_pattern=qso_call_pattern,
+                            log_format=self.contest_log_format if self.config.has_option('log', 'format') else None,
+                            period_starts=period_starts,
+                            period_numbers=period_numbers,
+                            qso_time_tolerance=self.contest_qso_time_tolerance)
+
+    def fingerprint(self):
+        """
+        :return: a hash of the rules settings (comments and formatting are ignored)
+        """
+        settings = {section: dict(self.config[section]) for section in self.config.sections()}
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,128 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase, mock
+
+import benchmark
+import edi
+import rules
+
+
+class TestBenchmark(TestCase):
+    def test_synthetic_qso_lines(self):
+        lines = benchmark.synthetic_qso_lines(500)
+        self.assertEqual(500, len(lines))
+        for nr, line in enumerate(lines):
+            qso = edi.LogQso(line, nr + 1)
+            self.assertTrue(qso.valid, qso.errors)
+
+    def test_qso_memory(self):
+        self.assertGreater(benchmark.qso_memory(100), 0)
+
+    def test_synthetic_callsign(self):
+        callsigns = [benchmark.synthetic_callsign(nr) for nr in range(5000)]
+        self.assertEqual(['YO0AAA', 'YO1AAA', 'YO0AAB'], [callsigns[0], callsigns[1], callsigns[10]])
+        self.assertEqual(len(callsigns), len(set(callsigns)))
+        for callsign in callsigns[:100]:
+            self.assertTrue(edi.Log.validate_callsign(callsign))
+
+    def test_synthetic_contest(self):
+        with tempfile.TemporaryDirectory() as folder:
+            rules_path, logs_folder, checklogs_folder = benchmark.synthetic_contest(
+                folder, operators_nr=10, qsos_nr=12, bands_nr=3, periods_nr=2, error_rate=0, checklogs_share=0.2)
+            _rules = rules.Rules(rules_path)
+            self.assertEqual((3, 2), (_rules.contest_bands_nr, _rules.contest_periods_nr))
+            self.assertEqual(24, len(os.listdir(logs_folder)))
+            self.assertEqual(6, len(os.listdir(checklogs_folder)))
+
+            operators = edi.crosscheck_logs_filter(edi.Log, rules=_rules, logs_folder=logs_folder,
+                                                   checklogs_folder=checklogs_folder)
+            self.assertEqual(10, len(operators))
+            for operator in operators.values():
+                for log in operator.logs:
+                    self.assertTrue(log.valid_header, log.errors)
+                    self.assertTrue(log.valid_qsos, log.errors)
+                    self.assertEqual(12, len(log.qsos))
+                    self.assertEqual({1, 2}, {qso.period_nr for qso in log.qsos})
+                    if not log.use_as_checklog:
+                        # mutual qsos without errors are all confirmed
+                        self.assertEqual(12, log.qsos_confirmed)
+
+    def test_synthetic_contest_errors(self):
+        with tempfile.TemporaryDirectory() as folder:
+            rules_path, logs_folder, checklogs_folder = benchmark.synthetic_contest(
+                folder, operators_nr=10, qsos_nr=8, error_rate=1, checklogs_share=0)
+            result = benchmark.contest_benchmark(rules_path, logs_folder, checklogs_folder)
+        self.assertEqual(20, result['logs'])
+        self.assertEqual(160, result['qsos'])
+        self.assertLess(result['confirmed_qsos'], 160)
+
+    def test_contest_benchmark(self):
+        with tempfile.TemporaryDirectory() as folder:
+            paths = benchmark.synthetic_contest(folder, operators_nr=5, qsos_nr=4, error_rate=0, checklogs_share=0)
+            result = benchmark.contest_benchmark(*paths)
+        self.assertEqual((10, 40, 40), (result['logs'], result['qsos'], result['confirmed_qsos']))
+        self.assertEqual(set(benchmark.PHASES), set(result['seconds']))
+        self.assertAlmostEqual(sum(result['seconds'].values()), result['total_seconds'])
+
+    def test_check_scales_value(self):
+        self.assertEqual([(100, 100), (2000, 1000)], benchmark.check_scales_value('100x100,2000X1000'))
+        for value in ('100', '100x', 'ax100', '100x100x1', '2x10'):
+            with self.subTest(value=value):
+                self.assertRaises(argparse.ArgumentTypeError, benchmark.check_scales_value, value)
+
+    @mock.patch('benchmark.qso_memory', return_value=500)
+    def test_main_report(self, mock_memory):
+        with tempfile.TemporaryDirectory() as folder:
+            report_path = os.path.join(folder, 'report.json')
+            with mock.patch('sys.stdout', new_callable=io.StringIO):
+                benchmark.main(['-s', '5x4,6x4', '--report', report_path])
+            with open(report_path) as _file:
+                report = json.load(_file)
+        self.assertEqual(500, report['memory_per_qso'])
+        self.assertEqual([(5, 4), (6, 4)], [(result['operators'], result['qsos_per_log'])
+                                            for result in report['scales']])
+
+    def test_main_generate(self):
+        with tempfile.TemporaryDirectory() as folder:
+            with mock.patch('sys.stdout', new_callable=io.StringIO):
+                benchmark.main(['-s', '5x4', '--generate', folder])
+            self.assertTrue(os.path.isfile(os.path.join(folder, 'rules.config')))
+            self.assertEqual(10, len(os.listdir(os.path.join(folder, 'logs'))))
+
+    def test_parse_import_times(self):
+        text = 'import time: self [us] | cumulative | imported package\n' \
+               'import time:       100 |        100 |   _json\n' \
+               'import time:       200 |        300 | json\n' \
+               'some other line\n' \
+               'import time:       500 |       1500 | edi\n'
+        self.assertEqual({'json': 300, 'edi': 1500}, benchmark.parse_import_times(text))
+
+    @mock.patch('subprocess.run')
+    def test_startup_benchmark(self, mock_run):
+        mock_run.side_effect = [mock.Mock(stderr='import time: 1 | 900 | edi\n'),
+                                mock.Mock(stderr='import time: 1 | 700 | edi\nimport time: 1 | 50 | json\n')]
+        results = benchmark.startup_benchmark({'slc': ['-slc', 'a.edi']}, repeat=2)
+        self.assertEqual(750, results['slc']['import_us'])
+        self.assertEqual({'edi': 700, 'json': 50}, results['slc']['imports'])
+        args = mock_run.call_args[0][0]
+        self.assertEqual(['-X', 'importtime'], args[1:3])
+        self.assertEqual(['-slc', 'a.edi'], args[-2:])
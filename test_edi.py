@@ -16,6 +16,10 @@ limitations under the License.
 
 import io
 import os
+import pickle
+import shutil
+import tempfile
+from datetime import datetime
 from unittest import TestCase, mock
 from unittest.mock import mock_open, patch
 
@@ -806,6 +810,25 @@ class TestEdiLog(TestCase):
         self.assertTupleEqual((['YO5PJB'], 3), log.get_field('PCall'), "PCall field should return YO5PJB at line 3")
         self.assertTupleEqual((['YO5PJB'], 3), log.get_field('pcall'), "PCall field should be case insensitive")
 
+    def test_parse_header(self):
+        mock_data = [
+            'PCall=YO5PJB\n',
+            'pwwlo=KN16SS\n',
+            'PBand=144 MHz\n',
+            'RName=\n',
+            'RName=John Doe\n',
+            '[QSORecords;1]\n',
+            'PSect=SOMB\n',
+            '[END; SomeToolSignature]\n',
+        ]
+        with patch.object(edi.Log, 'read_file_content', return_value=mock_data):
+            log = edi.Log('some_log_file.edi')
+        self.assertDictEqual({'PCALL': (['YO5PJB'], 1),
+                              'PWWLO': (['KN16SS'], 2),
+                              'PBAND': (['144 MHz'], 3),
+                              'RNAME': (['', 'John Doe'], 5)}, log.header_fields)
+        self.assertTupleEqual(([], None), log.get_field('PSect'), "Fields after [QSORecords should be ignored")
+
     @mock.patch.object(edi.Log, 'read_file_content')
     def test_get_qsos(self, mock_read_file_content):
         self.maxDiff = None
@@ -973,6 +996,81 @@ class TestEdiLog(TestCase):
         self.assertTrue(log.valid_header)
         self.assertTrue(log.valid_qsos)
 
+    @mock.patch('os.path.isfile')
+    def test_qsos_by_call_period(self, mock_isfile):
+        mock_isfile.return_value = True
+        mo_rules = mock.mock_open(read_data=VALID_RULES_BASIC)
+        with patch('builtins.open', mo_rules, create=True):
+            _rules = rules.Rules('some_rule_file.rules')
+
+        mock_data = [
+            'PCall=YO5PJB\n',
+            'PWWLo=KN16SS\n',
+            'PBand=144 MHz\n',
+            'PSect=SOMB\n',
+            'TDate=20130803;20130806\n',
+            '[QSORecords;4]\n',
+            '130803;1200;YO5BBB;6;59;001;59;001;;KN16SS;1;;;;\n',
+            '130803;1300;yo5bbb;6;59;002;59;002;;KN16SS;1;;;;\n',
+            '130804;0700;YO5BBB;6;59;003;59;003;;KN16SS;1;;;;\n',
+            '130804;0701;YO5CCC;6;59;004;59;004;;ZZ16SS;1;;;;\n',
+        ]
+        with patch.object(edi.Log, 'read_file_content', return_value=mock_data):
+            log = edi.Log('some_log_file.edi', rules=_rules)
+
+        self.assertListEqual([1, 1, 2, None], [qso.period_nr for qso in log.qsos])
+        self.assertEqual(1, log.qsos[1].epoch_minute - log.qsos[0].epoch_minute - 59)
+        index = log.qsos_by_call_period()
+        self.assertListEqual([('YO5BBB', 1), ('YO5BBB', 2)], list(index.keys()))
+        self.assertListEqual([log.qsos[0], log.qsos[1]], index[('YO5BBB', 1)])
+        self.assertListEqual([log.qsos[2]], index[('YO5BBB', 2)])
+        self.assertIs(index, log.qsos_by_call_period(), "Index should be built only once")
+
+    @mock.patch('os.path.isfile')
+    def test_qsos_in_time_window(self, mock_isfile):
+        mock_isfile.return_value = True
+        mo_rules = mock.mock_open(read_data=VALID_RULES_BASIC)
+        with patch('builtins.open', mo_rules, create=True):
+            _rules = rules.Rules('some_rule_file.rules')
+
+        mock_data = [
+            'PCall=YO5PJB\n',
+            'PWWLo=KN16SS\n',
+            'PBand=144 MHz\n',
+            'PSect=SOMB\n',
+            'TDate=20130803;20130806\n',
+            '[QSORecords;5]\n',
+            '130803;1300;YO5BBB;6;59;001;59;001;;KN16SS;1;;;;\n',
+            '130803;1210;YO5BBB;6;59;002;59;002;;KN16SS;1;;;;\n',
+            '130803;1205;YO5BBB;6;59;003;59;003;;KN16SS;1;;;;\n',
+            '130803;1204;YO5CCC;6;59;004;59;004;;KN16SS;1;;;;\n',
+            '130803;1200;YO5BBB;6;59;005;59;005;;KN16SS;1;;;;\n',
+        ]
+        with patch.object(edi.Log, 'read_file_content', return_value=mock_data):
+            log = edi.Log('some_log_file.edi', rules=_rules)
+
+        index = log.qsos_by_call_period()
+        self.assertListEqual([log.qsos[4], log.qsos[2], log.qsos[1], log.qsos[0]], index[('YO5BBB', 1)],
+                             "Indexed qsos should be sorted by time")
+        minute = log.qsos[2].epoch_minute
+        self.assertListEqual([log.qsos[4], log.qsos[2], log.qsos[1]], log.qsos_in_time_window('YO5BBB', 1, minute, 5))
+        self.assertListEqual([log.qsos[2]], log.qsos_in_time_window('YO5BBB', 1, minute, 4))
+        self.assertListEqual([], log.qsos_in_time_window('YO5BBB', 1, minute + 30, 5))
+        self.assertListEqual([], log.qsos_in_time_window('YO5BBB', 2, minute, 5))
+        self.assertListEqual([], log.qsos_in_time_window('YO5DDD', 1, minute, 5))
+
+    def test_init_with_contest_rules_snapshot(self):
+        _rules = rules.Rules(os.path.join('test_logs', 'rules.config'))
+        path = os.path.join('test_logs', 'logs', 'yo2lza_20160514_091251.edi')
+        log1 = edi.Log(path, rules=_rules)
+        log2 = edi.Log(path, rules=_rules.snapshot)
+        self.assertTrue(log2.valid_header)
+        self.assertDictEqual(log1.errors, log2.errors)
+        self.assertEqual(len(log1.qsos), len(log2.qsos))
+        self.assertIs(_rules.snapshot, edi.contest_rules(_rules))
+        self.assertIs(_rules.snapshot, edi.contest_rules(_rules.snapshot))
+        self.assertIsNone(edi.contest_rules(None))
+
     def test_validate_date_invalid_calendar_date(self):
         self.assertFalse(edi.Log.validate_date('20240230;20240231'))
 
@@ -992,6 +1090,59 @@ class TestEdiLog(TestCase):
                                '20170101;20170102', None)
 
 
+    def test_header_only(self):
+        edi_log = valid_edi_log.replace('130803;1322;YO5TP;6;59;003;59;002;;KN16SS;1;;;;',
+                                        '130803;1322;YO5TP;6;59;003;59;002;;KN16SS;1;;')
+        mo = mock.mock_open(read_data=edi_log)
+        with patch('builtins.open', mo, create=True):
+            log = edi.Log('some_log_file.edi', header_only=True)
+        self.assertTrue(log.valid_header)
+        self.assertTrue(log.header_only)
+        self.assertEqual(('YO5PJB', '144 MHz', 'single'), (log.callsign, log.band, log.category))
+        self.assertEqual([], log.qsos)
+        self.assertIsNone(log.valid_qsos)
+        self.assertFalse(any(line.upper().startswith('[QSORECORDS') for line in log.log_lines))
+        self.assertDictEqual({ERR_IO: [], ERR_HEADER: [], ERR_QSO: []}, log.errors)
+
+        with patch('builtins.open', mo, create=True):
+            log.load_qsos()
+            full_log = edi.Log('some_log_file.edi')
+        self.assertFalse(log.header_only)
+        self.assertFalse(log.valid_qsos)
+        self.assertEqual([q.qso_line for q in full_log.qsos], [q.qso_line for q in log.qsos])
+        self.assertDictEqual(full_log.errors, log.errors)
+
+        # the qsos are loaded only once
+        qsos = log.qsos
+        log.load_qsos()
+        full_log.load_qsos()
+        self.assertIs(qsos, log.qsos)
+        self.assertDictEqual(full_log.errors, log.errors)
+        self.assertEqual(1, len(log.errors[ERR_QSO]))
+
+    def test_log_lines(self):
+        mo = mock.mock_open(read_data=valid_edi_log)
+        with patch('builtins.open', mo, create=True):
+            file_log = edi.Log('some_log_file.edi')
+
+        with patch.object(edi.Log, 'read_file_content') as mock_read_file_content, \
+                patch.object(edi.Log, 'read_header_content') as mock_read_header_content:
+            log = edi.Log('some_log_file.edi', lines=io.StringIO(valid_edi_log).readlines())
+            header_log = edi.Log('some_log_file.edi', header_only=True, lines=io.StringIO(valid_edi_log).readlines())
+            header_log.load_qsos()
+        mock_read_file_content.assert_not_called()
+        mock_read_header_content.assert_not_called()
+        self.assertEqual(file_log.callsign, log.callsign)
+        self.assertEqual([q.qso_line for q in file_log.qsos], [q.qso_line for q in log.qsos])
+        self.assertDictEqual(file_log.errors, log.errors)
+        self.assertFalse(header_log.header_only)
+        self.assertDictEqual(file_log.errors, header_log.errors)
+
+        output = edi.check_log(edi.Log, 'path/some_log_file.edi', lines=[])
+        self.assertDictEqual({edi.INFO_LOG: 'some_log_file.edi', ERR_IO: [(None, 'Log is empty')],
+                              ERR_HEADER: [], ERR_QSO: []}, output)
+
+
 class TestEdiLogQso(TestCase):
     def test_init(self):
         for (linenr, qso, valid, error) in test_logQso_qsos:
@@ -1016,6 +1167,32 @@ class TestEdiLogQso(TestCase):
             ret = edi.LogQso.regexp_qso_validator(line)
             self.assertEqual(message, ret)
 
+    def test_parse_qso_date_hour(self):
+        self.assertEqual((datetime(2013, 8, 3).toordinal(), None), edi.parse_qso_date('130803'))
+        self.assertEqual((None, 'unconverted data remains: 99'), edi.parse_qso_date('999999'))
+        self.assertEqual((12 * 60 + 59, None), edi.parse_qso_hour('1259'))
+        self.assertEqual(None, edi.parse_qso_hour('2460')[0])
+
+        lq = edi.LogQso('130803;1319;YO5BTZ;6;59;001;59;001;;KN16SS;1;;;;', 1)
+        self.assertEqual(rules.epoch_minute(datetime(2013, 8, 3, 13, 19)), lq.epoch_minute)
+        lq = edi.LogQso('130803;2519;YO5BTZ;6;59;001;59;001;;KN16SS;1;;;;', 1)
+        self.assertIsNone(lq.epoch_minute)
+
+    def test_split_qso_line(self):
+        self.assertEqual(15, len(edi.LogQso.split_qso_line(test_valid_qso_lines[0])))
+        self.assertEqual('D;extra', edi.LogQso.split_qso_line('130803;1319;YO5BTZ;6;59;001;59;001;;KN16SS;1;;;;D;extra')[14])
+        self.assertIsNone(edi.LogQso.split_qso_line('130803;1319;YO5BTZ;6;59;001;59;001;;KN16SS;1;;;'))
+        # malformed long lines are rejected without backtracking
+        self.assertEqual('Incorrect Qso line format (incorrect number of fields).',
+                         edi.LogQso.regexp_qso_validator('130803;1319;' + 'A' * 100000))
+        # a line with an extra ';' is accepted by the qso regexp and the fields are checked one by one
+        line = '130803;1200;YO;5BBB;6;59;001;59;01;;KN16SS;1;;;;'
+        self.assertIsNone(edi.LogQso.regexp_qso_validator(line))
+        self.assertEqual([(1, line, 'Qso mode is invalid: 5BBB'),
+                          (1, line, 'Rst is invalid: 6'),
+                          (1, line, 'Rst is invalid: 001'),
+                          (1, line, 'Qso WWL is invalid: ')], edi.LogQso(line, 1).errors)
+
     def test_regexp_qso_validator(self):
         for (linenr, qso, valid, errors) in test_logQso_regexp_qso_validator:
             lq = edi.LogQso(qso, linenr)
@@ -1048,6 +1225,32 @@ class TestEdiLogQso(TestCase):
             self.assertEqual(lq.errors, error)
 
 
+    def test_qso_fields(self):
+        lq = edi.LogQso(test_valid_qso_lines[0], 1)
+        self.assertEqual(test_valid_qso_fields[0], lq.qso_fields)
+        self.assertEqual(len(test_valid_qso_fields[0]), len(lq.qso_fields))
+        self.assertEqual('YO5BTZ', lq.qso_fields.call)
+        self.assertRaises(KeyError, lq.qso_fields.__getitem__, 'copy')
+        self.assertRaises(KeyError, lq.qso_fields.__setitem__, 'unknown', '1')
+        self.assertFalse(hasattr(lq, '__dict__'))
+        # same values are shared between qsos
+        self.assertIs(lq.qso_fields['wwl'], edi.LogQso(test_valid_qso_lines[0], 2).qso_fields['wwl'])
+
+    @mock.patch('os.path.isfile')
+    def test_pickle(self, mock_isfile):
+        mock_isfile.return_value = True
+        mo = mock.mock_open(read_data=VALID_RULES)
+        with patch('builtins.open', mo, create=True):
+            _rules = rules.Rules('some_rule_file.rules')
+
+        lq = edi.LogQso('130803;1319;YO5BTZ;6;59;001;59;001;;KN16SS;1;;;;', 5, rules=_rules)
+        lq2 = pickle.loads(pickle.dumps(lq))
+        self.assertIsNone(lq2.rules)
+        for attr in edi.LogQso.__slots__:
+            if attr != 'rules':
+                self.assertEqual(getattr(lq, attr), getattr(lq2, attr), attr)
+
+
 class TestEdiOperator(TestCase):
     def test_init(self):
         op = edi.Operator('yo5pjb')
@@ -1095,6 +1298,32 @@ class TestEdiOperator(TestCase):
         self.assertListEqual(op.logs_by_band_regexp('144|145|2m'), [log1, log3])
 
 
+    @mock.patch('os.path.isfile')
+    def test_logs_by_band(self, mock_isfile):
+        mock_isfile.return_value = True
+        mo = mock.mock_open(read_data=VALID_RULES)
+        with patch('builtins.open', mo, create=True):
+            _rules = rules.Rules('some_rule_file.rules')
+
+        op = edi.Operator('yo5pjb')
+        logs = []
+        for band in ('144 MHz', '432 MHz', '2m', '2m'):
+            mo = mock.mock_open(read_data=valid_edi_log.replace('PBand=144 MHz', 'PBand=' + band))
+            with patch('builtins.open', mo, create=True):
+                logs.append(edi.Log('some_log_file.edi', rules=_rules))
+            logs[-1].valid_header = True
+        logs[3].valid_header = False
+        for log in logs:
+            op.add_log_instance(log)
+
+        self.assertEqual((1,), logs[0].band_nrs)
+        self.assertEqual((2,), logs[1].band_nrs)
+        self.assertListEqual([logs[0], logs[2]], op.logs_by_band(1))
+        self.assertListEqual([logs[1]], op.logs_by_band(2))
+        self.assertListEqual([], op.logs_by_band(3))
+        self.assertListEqual(op.logs_by_band_regexp('144|145|2m'), op.logs_by_band(1))
+
+
 class TestEdiHelperFunctions(TestCase):
     def test_dict_to_json(self):
         input = {'1': '2',
@@ -1108,6 +1337,51 @@ class TestEdiHelperFunctions(TestCase):
         output = b'<?xml version="1.0" encoding="UTF-8" ?><root><n1 type="str">2</n1><Hello type="str">World!</Hello></root>'
         self.assertEqual(edi.dict_to_xml(input), output)
 
+    def test_json_stream(self):
+        items = [{'log': 'a.edi', 'io': [], 'header': [(1, 'error')], 'qso': []}, {'log': 'b.edi'}]
+        for head, _items in (({'folder': 'logs'}, items), ({}, items), ({'folder': 'logs'}, [])):
+            expected = edi.dict_to_json(dict(head, logs=_items))
+            self.assertEqual(expected, ''.join(edi.json_stream(head, 'logs', iter(_items))))
+
+    def test_json_dict_stream(self):
+        items = [('YO5PJB', {'band': {'144': {'valid': True, 'qso_errors': ['a "b"']}}}), ('YO5AAA', {'band': {}}),
+                 (3, None)]
+        for head, _items in (({'folder': 'logs'}, items), ({}, items), ({'folder': 'logs'}, [])):
+            expected = edi.dict_to_json(dict(head, operators=dict(_items)))
+            self.assertEqual(expected, ''.join(edi.json_dict_stream(head, 'operators', iter(_items))))
+
+    def test_dict_to_xml(self):
+        dictionary = {'log': 'a&b\'s.edi', '144 MHz': {'valid': True, 'points': 12, 'ratio': 2.5, 'path': None},
+                      'YO5PJB/P': [1, 'a<b', True, None, [2], {'x': False}], '9A7D': (), 'n': {}}
+        expected = b'<?xml version="1.0" encoding="UTF-8" ?><root>' \
+                   b'<log type="str">a&amp;b&apos;s.edi</log>' \
+                   b'<key name="144 MHz" type="dict"><valid type="bool">true</valid><points type="int">12</points>' \
+                   b'<ratio type="float">2.5</ratio><path type="null"></path></key>' \
+                   b'<key name="YO5PJB/P" type="list"><item type="int">1</item><item type="str">a&lt;b</item>' \
+                   b'<item type="bool">True</item><item type="null"></item><item type="list"><item type="int">2' \
+                   b'</item></item><item type="dict"><x type="bool">false</x></item></key>' \
+                   b'<key name="9A7D" type="list"></key><n type="dict"></n></root>'
+        self.assertEqual(expected, edi.dict_to_xml(dictionary))
+
+    def test_xml_element_name(self):
+        names = (('log', ('log', '')), ('144', ('n144', '')), ('1.5', ('n1.5', '')), (144, ('n144', '')),
+                 ('a b', ('a_b', '')), ('xml:lang', ('xml:lang', '')), ('a:b', ('key', ' name="a:b"')),
+                 ('a&b', ('key', ' name="a&amp;b"')), ('ăîş', ('ăîş', '')), ('-a', ('key', ' name="-a"')))
+        for key, expected in names:
+            self.assertEqual(expected, edi.xml_element_name(key), key)
+
+    def test_xml_dict_stream(self):
+        items = [('YO5PJB', {'band': {'144': {'valid': True, 'qso_errors': ['a "b"']}}}), ('YO5AAA', {'band': {}})]
+        for head, _items in (({'folder': 'logs'}, items), ({}, items), ({'folder': 'logs'}, [])):
+            expected = edi.dict_to_xml(dict(head, operators=dict(_items)))
+            self.assertEqual(expected, b''.join(edi.xml_dict_stream(head, 'operators', iter(_items))))
+
+    def test_xml_stream(self):
+        items = [{'log': 'a&b.edi', 'io': [], 'header': [(1, 'error')], 'qso': []}, {'log': 'b.edi'}]
+        for head, _items in (({'folder': 'logs'}, items), ({'folder': 'logs'}, [])):
+            expected = edi.dict_to_xml(dict(head, logs=_items))
+            self.assertEqual(expected, b''.join(edi.xml_stream(head, 'logs', iter(_items))))
+
     def test_qth_distance(self):
         distance = [('KN16SS', 'KN16SS', 1),
                     ('KN16SS', 'KN16SQ', 9),
@@ -1336,6 +1610,110 @@ TDate=20130803;20130806
         self.assertEqual(1, operator_instances['YO5AAA'].logs[0].qsos_points)
         self.assertEqual(1, operator_instances['YO5AAA'].logs[0].qsos_confirmed)
 
+    def test_crosscheck_logs_filter_jobs(self):
+        _rules = rules.Rules(os.path.join('test_logs', 'rules.config'))
+        kwargs = {'logs_folder': os.path.join('test_logs', 'logs'),
+                  'checklogs_folder': os.path.join('test_logs', 'checklogs')}
+        serial = edi.crosscheck_logs_filter(edi.Log, _rules, jobs=1, **kwargs)
+        parallel = edi.crosscheck_logs_filter(edi.Log, _rules, jobs=2, **kwargs)
+
+        self.assertListEqual(list(serial.keys()), list(parallel.keys()), "Operators order should be the same")
+        for call, op in serial.items():
+            self.assertListEqual([(l.path, l.ignore_this_log, l.qsos_points, l.qsos_confirmed) for l in op.logs],
+                                 [(l.path, l.ignore_this_log, l.qsos_points, l.qsos_confirmed)
+                                  for l in parallel[call].logs])
+            for log in parallel[call].logs:
+                self.assertIs(_rules, log.rules)
+
+    def test_crosscheck_logs_compares_qsos_once(self):
+        _rules = rules.Rules(os.path.join('test_logs', 'rules.config'))
+        compared = []
+
+        def match_qso(log1, qso1, log2, qso2, **kwargs):
+            compared.append((id(qso1), id(qso2)))
+            return _match_qso(log1, qso1, log2, qso2, **kwargs)
+
+        _match_qso = edi.match_qso
+        with patch('edi.match_qso', side_effect=match_qso):
+            edi.crosscheck_logs_filter(edi.Log, _rules, logs_folder=os.path.join('test_logs', 'logs'),
+                                       checklogs_folder=os.path.join('test_logs', 'checklogs'))
+        self.assertNotEqual([], compared)
+        self.assertEqual(len(compared), len(set(compared)))
+        self.assertEqual(set(), set(compared) & set((qso2, qso1) for qso1, qso2 in compared))
+
+    def test_incremental_crosscheck(self):
+        def results(operators):
+            return {call: [(l.path, l.ignore_this_log, l.qsos_points, l.qsos_confirmed,
+                            [(q.line_nr, q.cc_confirmed, str(q.cc_error), q.points) for q in l.qsos])
+                           for l in op.logs]
+                    for call, op in operators.items()}
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        logs_folder = os.path.join(tmp, 'logs')
+        checklogs_folder = os.path.join(tmp, 'checklogs')
+        shutil.copytree(os.path.join('test_logs', 'logs'), logs_folder)
+        shutil.copytree(os.path.join('test_logs', 'checklogs'), checklogs_folder)
+        _rules = rules.Rules(os.path.join('test_logs', 'rules.config'))
+        state = os.path.join(tmp, 'crosscheck.state')
+
+        crosscheck = edi.IncrementalCrosscheck(edi.Log, _rules)
+        result = crosscheck.update(logs_folder, checklogs_folder)
+        self.assertIsNone(crosscheck.changed_callsigns)
+        self.assertEqual(results(edi.crosscheck_logs_filter(edi.Log, _rules, logs_folder, checklogs_folder)),
+                         results(result))
+        crosscheck.save(state)
+
+        # no changes
+        crosscheck = edi.IncrementalCrosscheck.load(state, edi.Log, _rules)
+        result = crosscheck.update(logs_folder, checklogs_folder)
+        self.assertEqual(set(), crosscheck.changed_callsigns)
+        self.assertEqual(results(edi.crosscheck_logs_filter(edi.Log, _rules, logs_folder, checklogs_folder)),
+                         results(result))
+
+        # removed log, changed log (a qso serial number), new log replacing an older one
+        filenames = sorted(os.listdir(logs_folder))
+        os.remove(os.path.join(logs_folder, filenames[0]))
+        with open(os.path.join(logs_folder, 'yo2lza_20160514_091251.edi'), 'r') as _file:
+            content = _file.read()
+        with open(os.path.join(logs_folder, 'yo2lza_20160514_091251.edi'), 'w') as _file:
+            _file.write(content.replace(';59;001;', ';59;901;', 1))
+        with open(os.path.join(logs_folder, 'yo2gl_20160510_173641.edi'), 'r') as _file:
+            lines = _file.readlines()
+        with open(os.path.join(logs_folder, 'yo2gl_20170101_000000.edi'), 'w') as _file:
+            _file.writelines(lines[:-3] + lines[-2:])
+        os.utime(os.path.join(logs_folder, 'yo2gl_20170101_000000.edi'), (2 * 10**9, 2 * 10**9))
+
+        expected = results(edi.crosscheck_logs_filter(edi.Log, _rules, logs_folder, checklogs_folder))
+        crosscheck = edi.IncrementalCrosscheck.load(state, edi.Log, _rules)
+        result = crosscheck.update(logs_folder, checklogs_folder)
+        self.assertEqual(3, len(crosscheck.changed_callsigns))
+        self.assertEqual(expected, results(result))
+        crosscheck.save(state)
+        crosscheck = edi.IncrementalCrosscheck.load(state, edi.Log, _rules)
+        result = crosscheck.update(logs_folder, checklogs_folder)
+        self.assertEqual(set(), crosscheck.changed_callsigns)
+        self.assertEqual(expected, results(result))
+
+        crosscheck = edi.IncrementalCrosscheck(edi.Log, _rules)
+        crosscheck.update(logs_folder, checklogs_folder)
+        os.remove(os.path.join(logs_folder, 'yo2gl_20170101_000000.edi'))
+        result = crosscheck.update(logs_folder, checklogs_folder)
+        self.assertIn('YO2GL', crosscheck.changed_callsigns)
+        self.assertEqual(results(edi.crosscheck_logs_filter(edi.Log, _rules, logs_folder, checklogs_folder)),
+                         results(result))
+
+    def test_check_logs_jobs(self):
+        _rules = rules.Rules(os.path.join('test_logs', 'rules.config'))
+        logs_folder = os.path.join('test_logs', 'logs')
+        logs_paths = [(os.path.join(logs_folder, filename), False) for filename in sorted(os.listdir(logs_folder))]
+        serial = list(edi.check_logs(edi.Log, logs_paths, rules=_rules))
+        parallel = list(edi.check_logs(edi.Log, logs_paths, rules=_rules, jobs=2))
+
+        self.assertEqual(len(logs_paths), len(serial))
+        self.assertListEqual(serial, parallel)
+        self.assertListEqual([os.path.basename(path) for path, _ in logs_paths], [log[edi.INFO_LOG] for log in parallel])
+
     def test_delta_ord_and_conv_maidenhead_to_latlong(self):
         self.assertEqual(5, edi.delta_ord('5'))
         self.assertEqual(0, edi.delta_ord('A'))
@@ -1349,6 +1727,37 @@ TDate=20130803;20130806
     def test_qth_distance_nontrivial(self):
         self.assertEqual(111, edi.qth_distance('KN16SS', 'KN17SS'))
 
+    def test_qth_distance_cache(self):
+        edi.distance_cache_clear()
+        self.assertEqual(111, edi.qth_distance('KN17SS', 'KN16SS'))
+        self.assertEqual(111, edi.qth_distance('KN16SS', 'KN17SS'))
+        self.assertEqual(1, edi.qth_distance('KN16SS', 'KN16SS'))
+        info = edi.distance_cache_info()
+        self.assertEqual((1, 1, 1), (info['distances']['hits'], info['distances']['misses'],
+                                     info['distances']['currsize']))
+        self.assertEqual((0, 2, 2), (info['locators']['hits'], info['locators']['misses'],
+                                     info['locators']['currsize']))
+        self.assertEqual(edi.DISTANCE_CACHE_SIZE, info['distances']['maxsize'])
+
+    def test_batch_qth_distance(self):
+        locators = ['KN16SS', 'KN17SS', 'KN16ST', 'JN99AA', 'KO20XX', 'LN05AB', 'IO91WM', 'RR99XX']
+        pairs = [(qth1, qth2) for qth1 in locators for qth2 in locators] * 3
+        expected = [edi.qth_distance(qth1, qth2) for qth1, qth2 in pairs]
+        self.assertGreaterEqual(len(pairs), edi.BATCH_DISTANCE_MIN_PAIRS)
+        self.assertListEqual(expected, edi.batch_qth_distance(pairs))
+        self.assertListEqual(expected[:3], edi.batch_qth_distance(pairs[:3]))
+        self.assertListEqual([], edi.batch_qth_distance([]))
+        with patch('edi.numpy', None):
+            self.assertListEqual(expected, edi.batch_qth_distance(pairs))
+
+    def test_import_numpy(self):
+        with patch('edi.numpy', False), patch.dict('sys.modules', {'numpy': None}):
+            self.assertIsNone(edi.import_numpy(), "None should be returned if NumPy is not installed")
+            self.assertIsNone(edi.numpy)
+        with patch('edi.numpy', False), patch.dict('sys.modules', {'numpy': mock.sentinel.numpy}):
+            self.assertIs(mock.sentinel.numpy, edi.import_numpy())
+            self.assertIs(mock.sentinel.numpy, edi.import_numpy())
+
     def test_mark_older_logs(self):
         log1 = mock.Mock(path='log1.edi')
         log2 = mock.Mock(path='log2.edi')
@@ -1361,6 +1770,24 @@ TDate=20130803;20130806
         self.assertTrue(log1.ignore_this_log)
         self.assertFalse(log2.ignore_this_log)
 
+    def test_match_qso(self):
+        qso1 = edi.LogQso('130803;1200;YO5BBB;6;59;001;59;002;;KN17SS;1;;;;', 1)
+        qso2 = edi.LogQso('130803;1203;YO5AAA;6;59;002;57;001;;KN16SS;1;;;;', 2)
+        log1 = mock.Mock(callsign='YO5AAA', maidenhead_locator='KN16SS')
+        log2 = mock.Mock(callsign='YO5BBB', maidenhead_locator='KN17SS')
+
+        self.assertEqual((False, edi.MISMATCH_RST_OTHER, 'Rst mismatch (other ham)', None),
+                         edi.match_qso(log1, qso1, log2, qso2))
+        self.assertEqual((False, edi.MISMATCH_RST, 'Rst mismatch', None), edi.match_qso(log2, qso2, log1, qso1))
+        qso2.qso_fields['rst_recv'] = '59'
+        self.assertEqual((True, None, None, None), edi.match_qso(log1, qso1, log2, qso2))
+        self.assertEqual((True, None, None, 111), edi.match_qso(log1, qso1, log2, qso2, distance=True))
+        self.assertEqual(111, edi.compare_qso(log1, qso1, log2, qso2))
+        qso2.epoch_minute += 3
+        self.assertEqual(edi.MISMATCH_TIME, edi.match_qso(log1, qso1, log2, qso2).code)
+        self.assertTrue(edi.match_qso(log1, qso1, log2, qso2, time_tolerance=10).matched)
+        self.assertRaisesRegex(ValueError, 'Different date/time between qso\'s', edi.compare_qso, log1, qso1, log2, qso2)
+
     def test_compare_qso_raises_first_qso_error(self):
         qso1 = edi.LogQso('999999;0657;YO8SSB;6;59;015;59;035;;KN27OD;133;;;;', 1)
         qso2 = edi.LogQso('130803;1200;YO5AAA;6;59;001;59;001;;KN16SS;1;;;;', 2)
@@ -1395,6 +1822,7 @@ TDate=20130803;20130806
         qso1 = edi.LogQso('130803;1200;YO5AAA;6;59;001;59;001;;KN16SS;1;;;;', 1)
         qso1.qso_fields['date'] = 'ABCDEF'
         qso1.valid = True
+        qso1.epoch_minute = None
         qso2 = edi.LogQso('130803;1200;YO5AAA;6;59;001;59;001;;KN16SS;1;;;;', 2)
         log1 = mock.Mock(callsign='YO5AAA', maidenhead_locator='KN16SS')
         log2 = mock.Mock(callsign='YO5AAA', maidenhead_locator='KN16SS')
@@ -1407,6 +1835,7 @@ TDate=20130803;20130806
         qso1 = edi.LogQso('130803;1200;YO5AAA;6;59;001;59;001;;KN16SS;1;;;;', 1)
         qso1.qso_fields['hour'] = '12A0'
         qso1.valid = True
+        qso1.epoch_minute = None
         qso2 = edi.LogQso('130803;1200;YO5AAA;6;59;001;59;001;;KN16SS;1;;;;', 2)
         log1 = mock.Mock(callsign='YO5AAA', maidenhead_locator='KN16SS')
         log2 = mock.Mock(callsign='YO5AAA', maidenhead_locator='KN16SS')
@@ -13,3 +13,185 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import edi
+import logXchecker
+
+TEST_RULES = os.path.join('test_logs', 'rules.config')
+TEST_LOGS = os.path.join('test_logs', 'logs')
+TEST_CHECKLOGS = os.path.join('test_logs', 'checklogs')
+
+
+def run_main(args):
+    """Run logXchecker.main() with command line arguments and return the printed output"""
+    output = io.StringIO()
+    with patch('sys.argv', ['logXchecker.py'] + args), contextlib.redirect_stdout(output):
+        logXchecker.main()
+    return output.getvalue()
+
+
+class TestMain(TestCase):
+    def test_crosscheck_with_cache(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        args = ['-r', TEST_RULES, '-cc', TEST_LOGS, '-cl', TEST_CHECKLOGS, '-o', 'json']
+        expected = run_main(args)
+
+        cache_args = args + ['--cache', os.path.join(tmp, 'cache')]
+        self.assertEqual(expected, run_main(cache_args))
+        self.assertNotEqual([], os.listdir(os.path.join(tmp, 'cache')))
+        self.assertEqual(expected, run_main(cache_args))
+        self.assertEqual(expected, run_main(cache_args + ['--clear-cache']))
+        self.assertIn(edi.INFO_OPERATORS, json.loads(expected))
+
+    def test_crosscheck_incremental(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        args = ['-r', TEST_RULES, '-cc', TEST_LOGS, '-cl', TEST_CHECKLOGS, '-o', 'json', '-v']
+        expected = run_main(args)
+
+        incremental_args = args + ['--incremental', os.path.join(tmp, 'crosscheck.state')]
+        self.assertEqual(expected, run_main(incremental_args))
+        self.assertTrue(os.path.isfile(os.path.join(tmp, 'crosscheck.state')))
+        self.assertEqual(expected, run_main(incremental_args))
+
+    def test_crosscheck_streamed_output(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        args = ['-r', TEST_RULES, '-cc', TEST_LOGS, '-cl', TEST_CHECKLOGS, '-v']
+        operators = edi.crosscheck_logs_filter(edi.Log, rules=logXchecker._rules.Rules(TEST_RULES),
+                                               logs_folder=TEST_LOGS, checklogs_folder=TEST_CHECKLOGS)
+        expected = {edi.INFO_CC: TEST_LOGS,
+                    edi.INFO_OPERATORS: dict(logXchecker.operators_output(operators, verbose=True))}
+        self.assertEqual(edi.dict_to_json(expected) + '\n', run_main(args + ['-o', 'json']))
+
+        for output_format in ('json', 'xml', 'csv', 'human-friendly'):
+            output_path = os.path.join(tmp, 'output.' + output_format)
+            expected = run_main(args + ['-o', output_format])
+            printed = run_main(args + ['-o', output_format, '--output-file', output_path])
+            with open(output_path) as _file:
+                self.assertEqual(expected, printed + _file.read(), output_format)
+
+    def test_output_file_errors(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        args = ['-r', TEST_RULES, '-cc', TEST_LOGS, '-cl', TEST_CHECKLOGS, '-o', 'json']
+
+        # the output file is checked before the cross-check is done
+        missing_path = os.path.join(tmp, 'missing', 'output.json')
+        with patch('logXchecker.crosscheck_logs_filter') as mock_crosscheck, self.assertRaises(SystemExit) as context:
+            run_main(args + ['--output-file', missing_path])
+        self.assertEqual(1, context.exception.code)
+        mock_crosscheck.assert_not_called()
+
+        # the output file is closed if the output fails
+        output_path = os.path.join(tmp, 'output.json')
+        opened = []
+        real_open = open
+
+        def tracking_open(*open_args, **kwargs):
+            _file = real_open(*open_args, **kwargs)
+            opened.append(_file)
+            return _file
+        with patch('logXchecker.print_json_output', side_effect=RuntimeError), \
+                patch('logXchecker.open', tracking_open, create=True), self.assertRaises(RuntimeError):
+            run_main(args + ['--output-file', output_path])
+        self.assertEqual(1, len(opened))
+        self.assertTrue(opened[0].closed)
+
+    def test_crosscheck_jobs(self):
+        args = ['-r', TEST_RULES, '-cc', TEST_LOGS, '-cl', TEST_CHECKLOGS, '-o', 'csv']
+        self.assertEqual(run_main(args), run_main(args + ['-j', '2']))
+
+    def test_multilogcheck_jobs(self):
+        for output_format in ('human-friendly', 'json', 'xml'):
+            args = ['-r', TEST_RULES, '-mlc', TEST_LOGS, '-cl', TEST_CHECKLOGS, '-o', output_format]
+            expected = run_main(args)
+            self.assertEqual(expected, run_main(args + ['-j', '3']), output_format)
+
+        result = json.loads(run_main(['-r', TEST_RULES, '-mlc', TEST_LOGS, '-o', 'json', '-j', '2']))
+        self.assertEqual(TEST_LOGS, result[edi.INFO_MLC])
+        self.assertListEqual(os.listdir(TEST_LOGS), [log[edi.INFO_LOG] for log in result[edi.INFO_LOGS]])
+
+    def test_multilogcheck_header_only(self):
+        args = ['-r', TEST_RULES, '-mlc', TEST_LOGS, '-o', 'json']
+        full = json.loads(run_main(args))
+        result = json.loads(run_main(args + ['--header-only']))
+        self.assertEqual(json.loads(run_main(args + ['--header-only', '-j', '2'])), result)
+        for log, full_log in zip(result[edi.INFO_LOGS], full[edi.INFO_LOGS]):
+            self.assertEqual(full_log[edi.ERR_HEADER], log[edi.ERR_HEADER])
+            self.assertEqual([], log[edi.ERR_QSO])
+
+    def test_multilogcheck_csv(self):
+        with patch('edi.Log') as mock_log:
+            output = run_main(['-r', TEST_RULES, '-mlc', TEST_LOGS, '-o', 'csv'])
+        self.assertEqual('NOT IMPLEMENTED\n', output)
+        mock_log.assert_not_called()
+
+    def test_crosscheck_profile(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        args = ['-r', TEST_RULES, '-cc', TEST_LOGS, '-cl', TEST_CHECKLOGS, '-o', 'json']
+        expected = run_main(args)
+        match_qso = edi.match_qso
+
+        stderr = io.StringIO()
+        stats_path = os.path.join(tmp, 'crosscheck.prof')
+        with contextlib.redirect_stderr(stderr):
+            self.assertEqual(expected, run_main(args + ['--profile', '--profile-dump', stats_path]))
+        profile = json.loads(stderr.getvalue())['profile']
+        for phase in ('rules', 'file_io', 'header', 'qsos', 'mark_older_logs', 'crosscheck', 'score', 'output'):
+            self.assertIn(phase, profile['phases'])
+        self.assertEqual(len(os.listdir(TEST_LOGS)) + len(os.listdir(TEST_CHECKLOGS)), profile['counters']['logs'])
+        for counter in ('qsos', 'regex_evaluations', 'qso_comparisons', 'distance_computations'):
+            self.assertGreater(profile['counters'][counter], 0, counter)
+        self.assertTrue(os.path.isfile(stats_path))
+        self.assertIs(match_qso, edi.match_qso, "edi functions should be restored after profiling")
+
+    def test_crosscheck_profile_counters(self):
+        # the logs & qsos loaded from cache or by worker processes are counted
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        args = ['-r', TEST_RULES, '-cc', TEST_LOGS, '-cl', TEST_CHECKLOGS, '-o', 'json', '--profile']
+        counters = []
+        for extra_args in (['--cache', tmp], ['--cache', tmp], ['-j', '2']):
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                run_main(args + extra_args)
+            counters.append(json.loads(stderr.getvalue())['profile']['counters'])
+        for _counters in counters:
+            self.assertEqual(len(os.listdir(TEST_LOGS)) + len(os.listdir(TEST_CHECKLOGS)), _counters['logs'])
+            self.assertEqual(counters[0]['qsos'], _counters['qsos'])
+        self.assertGreater(counters[0]['regex_evaluations'], 0)
+        self.assertEqual(counters[0]['logs'], counters[1]['cache_hits'])
+
+    def test_singlelogcheck_profile_counters(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            run_main(['-r', TEST_RULES, '-slc', os.path.join(TEST_LOGS, 'yo2lza_20160514_091251.edi'), '-o', 'json',
+                      '--profile'])
+        counters = json.loads(stderr.getvalue())['profile']['counters']
+        self.assertEqual(1, counters['logs'])
+        self.assertGreater(counters['qsos'], 0)
+        self.assertGreater(counters['regex_evaluations'], counters['qsos'])
+
+    def test_singlelogcheck_lazy_imports(self):
+        # the optional dependencies & the modules of other modes are not imported by a single log check
+        code = ('import sys, logXchecker; sys.argv = ["logXchecker.py"] + sys.argv[1:]; logXchecker.main(); '
+                'print(sorted(set(sys.modules) & {"numpy", "validate_email", "concurrent.futures", "zipfile", '
+                '"tarfile", "logcache", "cProfile", "pickle"}), file=sys.stderr)')
+        process = subprocess.run([sys.executable, '-c', code, '-r', TEST_RULES, '-slc',
+                                  os.path.join(TEST_LOGS, 'yo2lza_20160514_091251.edi'), '-o', 'json'],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(0, process.returncode, process.stderr)
+        self.assertEqual('[]', process.stderr.strip())
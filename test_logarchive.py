@@ -0,0 +1,138 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from unittest import TestCase
+
+import edi
+import logarchive
+import logcache
+import rules
+
+TEST_RULES = os.path.join('test_logs', 'rules.config')
+TEST_LOGS = os.path.join('test_logs', 'logs')
+TEST_CHECKLOGS = os.path.join('test_logs', 'checklogs')
+
+
+def make_archive(path, folder):
+    """Create a zip or tar archive with the files from folder (in os.listdir() order)"""
+    filenames = os.listdir(folder)
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for filename in filenames:
+                archive.write(os.path.join(folder, filename), filename)
+    else:
+        with tarfile.open(path, 'w:gz' if path.endswith('.gz') else 'w') as archive:
+            for filename in filenames:
+                archive.add(os.path.join(folder, filename), filename)
+    return path
+
+
+class TestLogArchive(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.addCleanup(logarchive.close_archives)
+
+    def test_archives(self):
+        filename = os.listdir(TEST_LOGS)[0]
+        with open(os.path.join(TEST_LOGS, filename), 'r') as _file:
+            expected = _file.readlines()
+
+        for name in ('logs.zip', 'logs.tar', 'logs.tar.gz'):
+            path = make_archive(os.path.join(self.tmp, name), TEST_LOGS)
+            self.assertTrue(logarchive.is_archive(path), name)
+            self.assertTrue(logarchive.is_logs_folder(path), name)
+            self.assertListEqual(os.listdir(TEST_LOGS), logarchive.listdir(path), name)
+
+            member = os.path.join(path, filename)
+            self.assertEqual((path, filename), logarchive.split_path(member))
+            with logarchive.open_text(member) as _file:
+                self.assertListEqual(expected, _file.readlines(), name)
+            self.assertEqual(os.path.getsize(os.path.join(TEST_LOGS, filename)), logarchive.stat(member)[0])
+            self.assertAlmostEqual(os.path.getmtime(os.path.join(TEST_LOGS, filename)), logarchive.getmtime(member),
+                                   delta=2)
+            self.assertRaises(FileNotFoundError, logarchive.open_text, os.path.join(path, 'missing.edi'))
+
+            log = edi.Log(member)
+            self.assertEqual(edi.Log(os.path.join(TEST_LOGS, filename)).errors, log.errors)
+
+    def test_replaced_archive(self):
+        filenames = sorted(os.listdir(TEST_LOGS))
+        path = make_archive(os.path.join(self.tmp, 'logs.zip'), TEST_LOGS)
+        member = os.path.join(path, filenames[0])
+        with logarchive.open_text(member) as _file:
+            first = _file.read()
+        size = logarchive.stat(member)[0]
+
+        # an upload replaces the archive with a new file
+        folder = os.path.join(self.tmp, 'new_logs')
+        os.mkdir(folder)
+        shutil.copy(os.path.join(TEST_LOGS, filenames[1]), os.path.join(folder, filenames[0]))
+        os.replace(make_archive(os.path.join(self.tmp, 'new_logs.zip'), folder), path)
+
+        self.assertEqual([filenames[0]], logarchive.listdir(path))
+        with logarchive.open_text(member) as _file:
+            self.assertNotEqual(first, _file.read())
+        self.assertEqual(os.path.getsize(os.path.join(TEST_LOGS, filenames[1])), logarchive.stat(member)[0])
+        self.assertNotEqual(size, logarchive.stat(member)[0])
+
+    def test_closing_archives(self):
+        _rules = rules.Rules(TEST_RULES)
+        logs = make_archive(os.path.join(self.tmp, 'logs.zip'), TEST_LOGS)
+        checklogs = make_archive(os.path.join(self.tmp, 'checklogs.tar'), TEST_CHECKLOGS)
+
+        with logarchive.closing_archives():
+            logarchive.listdir(logs)
+            self.assertEqual(1, len(logarchive._archives))
+        self.assertEqual({}, logarchive._archives)
+
+        edi.crosscheck_logs_filter(edi.Log, _rules, logs_folder=logs, checklogs_folder=checklogs)
+        self.assertEqual({}, logarchive._archives)
+        crosscheck = edi.IncrementalCrosscheck(edi.Log, _rules)
+        crosscheck.update(logs, checklogs)
+        self.assertEqual({}, logarchive._archives)
+        results = list(edi.check_logs(edi.Log, [(os.path.join(logs, name), False) for name in os.listdir(TEST_LOGS)]))
+        self.assertEqual(len(os.listdir(TEST_LOGS)), len(results))
+        self.assertEqual({}, logarchive._archives)
+
+    def test_regular_files(self):
+        self.assertEqual((None, TEST_RULES), logarchive.split_path(TEST_RULES))
+        self.assertFalse(logarchive.is_archive(TEST_LOGS))
+        self.assertTrue(logarchive.is_logs_folder(TEST_LOGS))
+        self.assertFalse(logarchive.is_logs_folder(os.path.join(self.tmp, 'missing.zip')))
+        self.assertEqual(os.path.getmtime(TEST_RULES), logarchive.getmtime(TEST_RULES))
+
+    def test_crosscheck_archives(self):
+        _rules = rules.Rules(TEST_RULES)
+        logs = make_archive(os.path.join(self.tmp, 'logs.zip'), TEST_LOGS)
+        checklogs = make_archive(os.path.join(self.tmp, 'checklogs.tar.gz'), TEST_CHECKLOGS)
+        cache = logcache.LogCache(os.path.join(self.tmp, 'cache'), rules=_rules)
+
+        def points(operators):
+            return {call: sorted((log.band, log.qsos_points, log.qsos_confirmed) for log in op.logs)
+                    for call, op in operators.items()}
+
+        expected = points(edi.crosscheck_logs_filter(edi.Log, _rules, logs_folder=TEST_LOGS,
+                                                     checklogs_folder=TEST_CHECKLOGS))
+        for kwargs in ({}, {'jobs': 2}, {'cache': cache}, {'cache': cache}):
+            result = edi.crosscheck_logs_filter(edi.Log, _rules, logs_folder=logs, checklogs_folder=checklogs, **kwargs)
+            self.assertEqual(expected, points(result), kwargs)
+        self.assertEqual(cache.misses, cache.hits)
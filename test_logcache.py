@@ -0,0 +1,107 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import edi
+import logcache
+import rules
+
+TEST_LOG = os.path.join('test_logs', 'logs', 'yo2lza_20160514_091251.edi')
+TEST_RULES = os.path.join('test_logs', 'rules.config')
+
+
+class TestLogCache(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache_folder = os.path.join(self.tmp, 'cache')
+        self.log_path = os.path.join(self.tmp, 'log.edi')
+        shutil.copy(TEST_LOG, self.log_path)
+        self.rules = rules.Rules(TEST_RULES)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_load_log(self):
+        cache = logcache.LogCache(self.cache_folder, rules=self.rules)
+        log1 = cache.load_log(edi.Log, self.log_path, rules=self.rules)
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertEqual(1, len(os.listdir(self.cache_folder)))
+
+        cache = logcache.LogCache(self.cache_folder, rules=self.rules)
+        log2 = cache.load_log(edi.Log, self.log_path, rules=self.rules)
+        self.assertEqual((1, 0), (cache.hits, cache.misses))
+        self.assertIsNot(log1, log2)
+        self.assertIs(self.rules, log2.rules, "Rules should be set back on cached log")
+        self.assertIs(self.rules, log2.qsos[0].rules, "Rules should be set back on cached qsos")
+        self.assertDictEqual(log1.errors, log2.errors)
+        self.assertEqual(log1.callsign, log2.callsign)
+        self.assertEqual([q.qso_line for q in log1.qsos], [q.qso_line for q in log2.qsos])
+
+        # checklog flag is part of the key
+        log3 = cache.load_log(edi.Log, self.log_path, rules=self.rules, checklog=True)
+        self.assertTrue(log3.use_as_checklog)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_load_changed_log(self):
+        cache = logcache.LogCache(self.cache_folder, rules=self.rules)
+        cache.load_log(edi.Log, self.log_path, rules=self.rules)
+
+        with open(self.log_path, 'a') as _file:
+            _file.write('\n')
+        cache.load_log(edi.Log, self.log_path, rules=self.rules)
+        self.assertEqual((0, 2), (cache.hits, cache.misses))
+
+        # other rules will invalidate the entries
+        cache = logcache.LogCache(self.cache_folder, rules=None)
+        log = cache.load_log(edi.Log, self.log_path)
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertIsNone(log.rules)
+
+    def test_load_missing_log(self):
+        cache = logcache.LogCache(self.cache_folder, rules=self.rules)
+        log = cache.load_log(edi.Log, os.path.join(self.tmp, 'missing.edi'), rules=self.rules)
+        self.assertFalse(log.valid_header)
+        self.assertEqual(1, len(log.errors[edi.ERR_IO]))
+        self.assertEqual([], os.listdir(self.cache_folder))
+
+    def test_corrupted_entry_and_clear(self):
+        cache = logcache.LogCache(self.cache_folder, rules=self.rules)
+        entry_path = cache.entry_path(self.log_path)
+        with open(entry_path, 'wb') as _file:
+            _file.write(b'not a pickle')
+        log = cache.load_log(edi.Log, self.log_path, rules=self.rules)
+        self.assertTrue(log.valid_header)
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+        cache.clear()
+        self.assertEqual([], os.listdir(self.cache_folder))
+
+    def test_crosscheck_logs_filter_with_cache(self):
+        logs_folder = os.path.join('test_logs', 'logs')
+        expected = edi.crosscheck_logs_filter(edi.Log, rules=self.rules, logs_folder=logs_folder)
+
+        for _ in range(2):
+            cache = logcache.LogCache(self.cache_folder, rules=self.rules)
+            result = edi.crosscheck_logs_filter(edi.Log, rules=self.rules, logs_folder=logs_folder, cache=cache)
+            self.assertListEqual(sorted(expected.keys()), sorted(result.keys()))
+            for call, op in expected.items():
+                self.assertListEqual([(l.path, l.qsos_points, l.qsos_confirmed) for l in op.logs],
+                                     [(l.path, l.qsos_points, l.qsos_confirmed) for l in result[call].logs])
+        self.assertEqual(0, cache.misses)
@@ -0,0 +1,200 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import base64
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+import edi
+import logarchive
+import logdaemon
+import rules
+from test_logarchive import make_archive
+
+TEST_RULES = os.path.join('test_logs', 'rules.config')
+TEST_LOGS = os.path.join('test_logs', 'logs')
+
+
+def slc_output(path, _rules):
+    """-slc json output of a log"""
+    output = {edi.INFO_LOG: path}
+    output.update(edi.Log(path, rules=_rules).errors)
+    return json.loads(json.dumps(output))
+
+
+class TestLogDaemon(TestCase):
+    def setUp(self):
+        self.rules = rules.Rules(TEST_RULES)
+        self.daemon = logdaemon.LogDaemon(edi.Log, rules=self.rules)
+        self.paths = [os.path.join(TEST_LOGS, filename) for filename in sorted(os.listdir(TEST_LOGS))]
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.daemon.close()
+        shutil.rmtree(self.tmp)
+
+    def process(self, request):
+        return json.loads(json.dumps(self.daemon.process(json.dumps(request).encode('utf-8'))))
+
+    def test_parse_address(self):
+        self.assertEqual(('localhost', 8080), logdaemon.parse_address('8080'))
+        self.assertEqual(('127.0.0.1', 8080), logdaemon.parse_address('127.0.0.1:8080'))
+        self.assertEqual(('::1', 8080), logdaemon.parse_address('[::1]:8080'))
+        self.assertEqual('/tmp/logxchecker.sock', logdaemon.parse_address('/tmp/logxchecker.sock'))
+        self.assertRaisesRegex(ValueError, 'only on a local address', logdaemon.parse_address, '0.0.0.0:8080')
+        self.assertRaisesRegex(ValueError, 'only on a local address', logdaemon.parse_address, 'example.com:8080')
+
+    def test_process_path(self):
+        for path in self.paths:
+            self.assertDictEqual(slc_output(path, self.rules), self.process({'path': path}))
+
+        response = self.process({'path': self.paths[0], 'checklog': True, 'id': 'upload-1'})
+        self.assertEqual('upload-1', response['id'])
+        response = self.process({'path': os.path.join(self.tmp, 'missing.edi')})
+        self.assertEqual(1, len(response[edi.ERR_IO]))
+        self.assertTrue(response[edi.ERR_IO][0][1].startswith('Cannot read edi log. Error:'))
+
+    def test_process_archive_path(self):
+        archive = make_archive(os.path.join(self.tmp, 'logs.zip'), TEST_LOGS)
+        for filename in sorted(os.listdir(TEST_LOGS))[:5]:
+            response = self.process({'path': os.path.join(archive, filename)})
+            expected = slc_output(os.path.join(TEST_LOGS, filename), self.rules)
+            expected[edi.INFO_LOG] = os.path.join(archive, filename)
+            self.assertDictEqual(expected, response)
+
+    def test_process_replaced_archive(self):
+        filename = sorted(os.listdir(TEST_LOGS))[0]
+        path = os.path.join(self.tmp, 'up.zip')
+        member = os.path.join(path, filename)
+        folder = os.path.join(self.tmp, 'garbage')
+        os.mkdir(folder)
+        with open(os.path.join(folder, filename), 'w') as _file:
+            _file.write('garbage\n')
+
+        for jobs in (1, 2):
+            self.daemon.close()
+            self.daemon = logdaemon.LogDaemon(edi.Log, rules=self.rules, jobs=jobs)
+            make_archive(path, TEST_LOGS)
+            expected = slc_output(os.path.join(TEST_LOGS, filename), self.rules)
+            expected[edi.INFO_LOG] = member
+            self.assertDictEqual(expected, self.process({'path': member}), jobs)
+            self.assertEqual({}, logarchive._archives, 'the archive should be closed after the request')
+
+            # the upload robot replaces the archive atomically
+            os.replace(make_archive(os.path.join(self.tmp, 'new.zip'), folder), path)
+            response = self.process({'path': member})
+            self.assertNotEqual(expected, response, jobs)
+            self.assertTrue(response[edi.ERR_HEADER], jobs)
+
+    def test_process_content(self):
+        for path in self.paths[:10]:
+            with open(path, 'rb') as _file:
+                data = _file.read()
+            expected = slc_output(path, self.rules)
+            expected[edi.INFO_LOG] = os.path.basename(path)
+
+            response = self.process({'content_base64': base64.b64encode(data).decode('ascii'),
+                                     'name': os.path.basename(path)})
+            self.assertDictEqual(expected, response)
+            response = self.process({'content': data.decode('utf-8'),
+                                     'name': os.path.basename(path)})
+            self.assertDictEqual(expected, response)
+
+        response = self.process({'content': ''})
+        self.assertDictEqual({edi.INFO_LOG: logdaemon.DEFAULT_LOG_NAME, edi.ERR_IO: [[None, 'Log is empty']],
+                              edi.ERR_HEADER: [], edi.ERR_QSO: []}, response)
+        response = self.process({'content_base64': base64.b64encode(b'\xff\xfe[REG1TEST;1]').decode('ascii')})
+        self.assertTrue(response[edi.ERR_IO][0][1].startswith('Cannot read edi log. Error:'))
+
+    def test_process_header_only(self):
+        with open(self.paths[0]) as _file:
+            content = _file.read()
+        response = self.process({'content': content, 'header_only': True})
+        log = edi.Log(self.paths[0], rules=self.rules, header_only=True)
+        self.assertEqual(json.loads(json.dumps(log.errors[edi.ERR_HEADER])), response[edi.ERR_HEADER])
+        self.assertEqual([], response[edi.ERR_QSO])
+
+    def test_process_invalid_request(self):
+        self.assertIn('not valid JSON', self.daemon.process(b'{"path": ')['error'])
+        self.assertEqual({'error': 'Request must be a JSON object'}, self.process(['path']))
+        self.assertEqual({'error': 'Unknown command : reload'}, self.process({'command': 'reload'}))
+        self.assertEqual({'error': "Request must have 'path', 'content' or 'content_base64'"},
+                         self.process({'name': 'log.edi'}))
+        self.assertEqual({'error': "'path' must be a string"}, self.process({'path': 1}))
+        response = self.process({'content_base64': '!!'})
+        self.assertTrue(response['error'].startswith("'content_base64' is not valid base64"))
+
+    def test_stats(self):
+        report = self.process({'command': 'stats'})
+        self.assertEqual(0, report['requests'])
+        self.assertIsNone(report['latency_ms'])
+
+        for path in self.paths[:5]:
+            self.process({'path': path})
+        self.process({'name': 'log.edi'})
+        report = self.process({'command': 'stats'})
+        self.assertEqual(6, report['requests'])
+        self.assertEqual(1, report['failed_requests'])
+        self.assertEqual(0, report['active_requests'])
+        self.assertEqual(1, report['max_active_requests'])
+        self.assertGreater(report['requests_per_second'], 0)
+        latency = report['latency_ms']
+        self.assertEqual({'mean', 'min', 'max', 'p50', 'p95', 'p99'}, set(latency))
+        self.assertTrue(latency['min'] <= latency['p50'] <= latency['p95'] <= latency['p99'] <= latency['max'])
+        self.assertTrue(latency['min'] <= latency['mean'] <= latency['max'])
+
+    def serve(self, address):
+        server = self.daemon.server(address)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.addCleanup(stop)
+        return server.server_address
+
+    def check_concurrent_requests(self, address):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(lambda path: logdaemon.request(address, {'path': path}, timeout=30),
+                                          self.paths))
+        self.assertEqual([slc_output(path, self.rules) for path in self.paths], responses)
+        report = logdaemon.request(address, {'command': 'stats'}, timeout=30)
+        self.assertEqual(len(self.paths), report['requests'])
+        self.assertEqual(0, report['active_requests'])
+
+    def test_tcp_server(self):
+        address = self.serve(('127.0.0.1', 0))
+        self.check_concurrent_requests(address)
+
+    @unittest.skipUnless(hasattr(socketserver, 'ThreadingUnixStreamServer'), 'Unix sockets are not supported')
+    def test_unix_server(self):
+        address = self.serve(os.path.join(self.tmp, 'logxchecker.sock'))
+        self.check_concurrent_requests(address)
+
+    def test_jobs(self):
+        self.daemon.close()
+        self.daemon = logdaemon.LogDaemon(edi.Log, rules=self.rules, jobs=2)
+        address = self.serve(('127.0.0.1', 0))
+        self.check_concurrent_requests(address)
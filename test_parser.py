@@ -36,6 +36,8 @@ class TestParser(TestCase):
                                   (['-f=edi', '-mlc=xxx'], 0),
                                   (['-f=edi', '--multilogcheck=xxx'], 0),
                                   (['-f=edi', '-slc', '-mlc'], 2),
+                                  (['-f=edi', '-cc=xxx', '--clear-cache'], 2),
+                                  (['-f=edi', '-cc=xxx', '--cache=yyy', '--clear-cache'], 0),
                                   )
     testcase_with_success = (
                              (['-f=edi', '-slc=xxx.edi'], 'EDI', 'xxx.edi', False),
@@ -60,6 +62,9 @@ class TestParser(TestCase):
                 if exitCode != 0:
                     raise ValueError(f"Parser should have exited for args {arg} with code {exitCode}")
 
+        self.assertTrue(self.p.parse(['-f=edi', '-mlc=xxx', '--header-only']).header_only)
+        self.assertFalse(self.p.parse(['-f=edi', '-mlc=xxx']).header_only)
+
         for (arg, format, singlelogcheck, multilogcheck) in self.testcase_with_success:
             result = self.p.parse(arg)
             self.assertEqual(result.format.upper(), format.upper(),
@@ -0,0 +1,153 @@
+"""
+Copyright 2016-2022 Ciorceri Petru Sorin (yo5pjb)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import pstats
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+import edi
+import logcache
+import profiler
+import rules
+
+TEST_RULES = os.path.join('test_logs', 'rules.config')
+TEST_LOGS = os.path.join('test_logs', 'logs')
+TEST_LOG = os.path.join(TEST_LOGS, 'yo2lza_20160514_091251.edi')
+
+
+class TestProfiler(TestCase):
+    @mock.patch('time.process_time')
+    @mock.patch('time.perf_counter')
+    def test_phase_excludes_nested_phases(self, mock_wall, mock_cpu):
+        mock_wall.side_effect = [0.0, 1.0, 4.0, 10.0]
+        mock_cpu.side_effect = [0.0, 0.5, 2.0, 5.0]
+        _profiler = profiler.Profiler()
+        with _profiler.phase('outer'):
+            with _profiler.phase('inner'):
+                pass
+        self.assertEqual({'wall_seconds': 3.0, 'cpu_seconds': 1.5, 'calls': 1}, _profiler.phases['inner'])
+        self.assertEqual({'wall_seconds': 7.0, 'cpu_seconds': 3.5, 'calls': 1}, _profiler.phases['outer'])
+
+    def test_disabled(self):
+        _profiler = profiler.Profiler(enabled=False)
+        match_qso = edi.match_qso
+        _profiler.start()
+        self.assertIs(match_qso, edi.match_qso)
+        with _profiler.phase('rules'):
+            pass
+        _profiler.stop()
+        self.assertEqual({}, _profiler.phases)
+
+    def test_start_stop(self):
+        originals = (edi.match_qso, edi.load_logs, edi.Log.__dict__['read_file_content'], edi.Log.validate_header)
+        _rules = rules.Rules(TEST_RULES)
+        expected = edi.Log(TEST_LOG, rules=_rules).errors
+
+        _profiler = profiler.Profiler()
+        _profiler.start()
+        self.addCleanup(_profiler.stop)
+        self.assertIsNot(originals[0], edi.match_qso)
+        log = edi.load_logs(edi.Log, [(TEST_LOG, False)], rules=_rules)[0]
+        _profiler.stop()
+
+        self.assertEqual(expected, log.errors)
+        self.assertEqual(originals, (edi.match_qso, edi.load_logs, edi.Log.__dict__['read_file_content'],
+                                     edi.Log.validate_header))
+        self.assertEqual(1, _profiler.counters['logs'])
+        self.assertEqual(len(log.qsos), _profiler.counters['qsos'])
+        self.assertGreaterEqual(_profiler.counters['regex_evaluations'], len(log.qsos))
+        self.assertEqual({'load', 'file_io', 'header', 'qsos'}, set(_profiler.phases))
+        report = _profiler.report()
+        self.assertEqual({'phases', 'total', 'counters', 'distance_cache'}, set(report))
+
+    def test_regex_evaluations(self):
+        # the precompiled patterns from rules are counted: band, category, callregexp (header & every qso)
+        _rules = rules.Rules(TEST_RULES)
+        counts = []
+        for log_rules in (_rules.snapshot._replace(qso_call_pattern=None), _rules):
+            _profiler = profiler.Profiler()
+            _profiler.start()
+            self.addCleanup(_profiler.stop)
+            log = edi.Log(TEST_LOG, rules=log_rules)
+            _profiler.stop()
+            counts.append(_profiler.counters['regex_evaluations'])
+        self.assertGreaterEqual(counts[1], len(log.qsos) * (len(edi.LogQso.QSO_FIELD_PATTERNS) +
+                                                            len(edi.LogQso.GENERIC_QSO_CHECKS) + 2))
+        self.assertEqual(len(log.qsos), counts[1] - counts[0])
+
+        # the regular expressions are counted only while profiling
+        regex_match = edi.regex_match
+        _profiler = profiler.Profiler()
+        _profiler.start()
+        self.addCleanup(_profiler.stop)
+        self.assertTrue(edi.regex_match(edi.contest_rules(_rules).call_pattern, 'YO5PJB'))
+        self.assertIsNone(edi.regex_match('^\\d+$', 'YO5PJB'))
+        _profiler.stop()
+        self.assertEqual(2, _profiler.counters['regex_evaluations'])
+        self.assertIs(regex_match, edi.regex_match)
+
+    def test_loaded_logs_counters(self):
+        # the logs from cache & from worker processes are counted
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        _rules = rules.Rules(TEST_RULES)
+        cache = logcache.LogCache(tmp, rules=_rules)
+        logs_paths = [(os.path.join(TEST_LOGS, filename), False) for filename in sorted(os.listdir(TEST_LOGS))[:4]]
+        qsos = sum(len(edi.Log(path, rules=_rules).qsos) for path, _ in logs_paths)
+
+        for kwargs in ({'cache': cache}, {'cache': cache}, {'jobs': 2}):
+            _profiler = profiler.Profiler()
+            _profiler.start()
+            self.addCleanup(_profiler.stop)
+            edi.load_logs(edi.Log, logs_paths, rules=_rules, **kwargs)
+            _profiler.stop()
+            self.assertEqual(len(logs_paths), _profiler.counters['logs'], kwargs)
+            self.assertEqual(qsos, _profiler.counters['qsos'], kwargs)
+        self.assertEqual(len(logs_paths), cache.hits)
+
+    def test_count_items(self):
+        _profiler = profiler.Profiler()
+        self.assertEqual([1, 2, 3], list(_profiler.count_items(iter([1, 2, 3]), 'logs')))
+        self.assertEqual(3, _profiler.counters['logs'])
+        items = iter([1])
+        self.assertIs(items, profiler.Profiler(enabled=False).count_items(items, 'logs'))
+
+    def test_counters(self):
+        edi.distance_cache_clear()
+        _profiler = profiler.Profiler()
+        _profiler.start()
+        self.addCleanup(_profiler.stop)
+        log = edi.Log(TEST_LOG)
+        qso1, qso2 = log.qsos[0], log.qsos[1]
+        edi.match_qso(log, qso1, log, qso2)
+        edi.batch_qth_distance([('KN16SS', 'KN27OD'), ('KN27OD', 'KN16SS'), ('KN16SS', 'KN16SS')])
+        _profiler.stop()
+        self.assertEqual(1, _profiler.counters['qso_comparisons'])
+        self.assertEqual(1, _profiler.counters['distance_computations'])
+
+    def test_cprofile_dump(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        stats_path = os.path.join(tmp, 'stats.prof')
+        _profiler = profiler.Profiler(enabled=False, cprofile_path=stats_path)
+        self.assertTrue(_profiler.enabled)
+        _profiler.start()
+        edi.Log(TEST_LOG)
+        _profiler.stop()
+        stats = pstats.Stats(stats_path)
+        self.assertTrue(any(function[2] == 'validate_header' for function in stats.stats))
@@ -14,6 +14,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+from datetime import datetime
 from unittest import TestCase
 from unittest import mock
 from unittest.mock import patch
@@ -624,3 +625,95 @@ class TestRules(TestCase):
             _rules = rules.Rules('some_rule_file.rules')
             self.assertEqual(_rules.contest_extra_fields, [],
                              "Extra fields should be empty when [extra] section is removed")
+
+    @mock.patch('os.path.isfile')
+    def test_fingerprint(self, mock_isfile):
+        mock_isfile.return_value = True
+        fingerprints = []
+        for content in (VALID_RULES, '# comment\n' + VALID_RULES, VALID_RULES_BASIC):
+            mo = mock.mock_open(read_data=content)
+            with patch('builtins.open', mo, create=True):
+                fingerprints.append(rules.Rules('some_rule_file.rules').fingerprint())
+        self.assertEqual(fingerprints[0], fingerprints[1], "Comments should not change the fingerprint")
+        self.assertNotEqual(fingerprints[0], fingerprints[2], "Different settings should change the fingerprint")
+
+    @mock.patch('os.path.isfile')
+    def test_compile(self, mock_isfile):
+        mock_isfile.return_value = True
+        mo = mock.mock_open(read_data=VALID_RULES)
+        with patch('builtins.open', mo, create=True):
+            _rules = rules.Rules('some_rule_file.rules')
+
+        contest = _rules.snapshot
+        self.assertIsInstance(contest, rules.ContestRules)
+        self.assertEqual(('20130803', '20130806', '1200', '1159'),
+                         (contest.begin_date, contest.end_date, contest.begin_hour, contest.end_hour))
+        self.assertEqual([1, 2], [band.nr for band in contest.bands])
+        self.assertEqual(('432', 2), (contest.bands[1].name, contest.bands[1].multiplier))
+        self.assertTrue(contest.bands[0].pattern.match('2m'))
+        self.assertFalse(contest.bands[0].pattern.match('2M'))
+        self.assertTrue(contest.bands[0].log_pattern.match('2M'))
+        self.assertEqual((rules.epoch_minute(datetime(2013, 8, 3, 12, 0)), rules.epoch_minute(datetime(2013, 8, 3, 17, 59))),
+                         (contest.periods[0].begin, contest.periods[0].end))
+        self.assertEqual(('band1', 'band2'), contest.periods[1].bands)
+        self.assertEqual('Single Operator Multi Band', contest.categories[2].name)
+        self.assertTrue(contest.categories[2].pattern.match(' SOMB '))
+        self.assertEqual((1, 2, 6), contest.modes)
+        self.assertEqual(frozenset([1, 2, 6]), contest.modes_set)
+        self.assertEqual(('callregexp', 'name', 'email', 'address'), contest.extra_fields)
+        self.assertTrue(contest.call_pattern.match('yo5pjb'))
+        self.assertFalse(contest.call_pattern.match('LZ1NY'))
+        self.assertTrue(contest.qso_call_pattern.match('YP5PJB'))
+        self.assertEqual('EDI', contest.log_format)
+        self.assertEqual(5, contest.qso_time_tolerance)
+        with self.assertRaises(AttributeError):
+            contest.begin_date = '20200101'
+
+        mo = mock.mock_open(read_data=VALID_RULES_BASIC)
+        with patch('builtins.open', mo, create=True):
+            contest = rules.Rules('some_rule_file.rules').snapshot
+        self.assertEqual((), contest.extra_fields)
+        self.assertIsNone(contest.call_pattern)
+        self.assertIsNone(contest.qso_call_pattern)
+
+    @mock.patch('os.path.isfile')
+    def test_contest_qso_time_tolerance(self, mock_isfile):
+        mock_isfile.return_value = True
+        mo = mock.mock_open(read_data=VALID_RULES.replace('modes=1,2,6', 'modes=1,2,6\nqsotimetolerance=2'))
+        with patch('builtins.open', mo, create=True):
+            _rules = rules.Rules('some_rule_file.rules')
+        self.assertEqual(2, _rules.contest_qso_time_tolerance)
+        self.assertEqual(2, _rules.snapshot.qso_time_tolerance)
+
+    def test_period_nr(self):
+        def period(nr, begin, end):
+            return rules.Period(nr=nr, begindate=None, enddate=None, beginhour=None, endhour=None, bands=(),
+                                begin=begin, end=end)
+        # overlapped periods : the first period number wins, empty period (begin > end) is ignored
+        periods = [period(1, 100, 199), period(2, 150, 299), period(3, 400, 499), period(4, 600, 500)]
+        starts, numbers = rules.ContestRules.period_table(periods)
+        contest = rules.ContestRules(*([None] * 14), period_starts=starts, period_numbers=numbers,
+                                     qso_time_tolerance=5)
+        tests = ((0, None), (99, None), (100, 1), (150, 1), (199, 1), (200, 2), (299, 2), (300, None),
+                 (399, None), (400, 3), (499, 3), (500, None), (550, None), (600, None), (10**7, None))
+        for minute, period_nr in tests:
+            self.assertEqual(period_nr, contest.period_nr(minute), 'minute {}'.format(minute))
+
+    @mock.patch('os.path.isfile')
+    def test_compile_invalid_values(self, mock_isfile):
+        mock_isfile.return_value = True
+        tests = (
+            (VALID_RULES.replace('regexp=144|145|2m', 'regexp=144|(145'), 'Rules file has invalid regexp for band 1'),
+            (VALID_RULES.replace('multiplier=2', 'multiplier=x2'), 'Rules file has invalid multiplier for band 2'),
+            (VALID_RULES.replace('regexp=somb', 'regexp=so[mb'), 'Rules file has invalid regexp for category 3'),
+            (VALID_RULES.replace('callregexp=yo|yp|yq|yr', 'callregexp=yo|(yp'),
+             'Rules file has invalid \'callregexp\' value in \\[extra\\] section'),
+            (VALID_RULES.replace('modes=1,2,6', 'modes=1,2,6\nqsotimetolerance=x'),
+             'The rules have invalid \'qsotimetolerance\' value in \\[contest\\] section'),
+            (VALID_RULES.replace('modes=1,2,6', 'modes=1,2,6\nqsotimetolerance=-1'),
+             'The rules have invalid \'qsotimetolerance\' value in \\[contest\\] section'),
+        )
+        for content, error_msg in tests:
+            mo = mock.mock_open(read_data=content)
+            with patch('builtins.open', mo, create=True):
+                self.assertRaisesRegex(ValueError, error_msg, rules.Rules, 'some_rule_file.rules')